@@ -249,7 +249,8 @@ app.post('/api/index', async (req, res) => {
               hash: indexResult.file_hash,
               chunks: indexResult.chunk_count,
               indexed_at: new Date().toISOString(),
-              size: file.size
+              size: indexResult.file_size ?? file.size,
+              mtime_ns: indexResult.file_mtime_ns
             };
             indexed++;
           }
@@ -11,23 +11,30 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import json
 import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-# --- Imports from existing modules (model loads here, once) ---
-from vector_store import store_document, delete_document, search_documents
+# --- Imports from existing modules (model loads once, at startup) ---
+import vector_store
+from vector_store import store_document, delete_document, embed_query, embed_queries, search_by_vector
 from index_metadata import (
-    get_file_hash,
+    get_file_stamp,
     get_files_needing_index,
     update_index_metadata,
     delete_index,
 )
-from config import is_feature_enabled
-from search_docs import deduplicate_results, merge_vector_results
+import config
+from config import get_semantic_cache_threshold
+from search_docs import deduplicate_results, merge_vector_streams, rerank_unnecessary
+from semantic_cache import SemanticCache
+import bm25_kernel
 
 # Connector framework
 import connectors  # registers all connector types
@@ -46,10 +53,17 @@ from parse_pptx import extract_text_from_pptx
 
 @asynccontextmanager
 async def lifespan(app):
-    """Start sync engine on startup, stop on shutdown."""
+    """Load models and start sync engine on startup, stop on shutdown."""
+    vector_store.warmup()
+    if config.RERANKER:
+        from reranker import warmup as warmup_reranker
+        warmup_reranker()
+    bm25_kernel.warmup()
     start_all_schedules()
     yield
     stop_all_schedules()
+    if _parse_pool is not None:
+        _parse_pool.shutdown(cancel_futures=True)
 
 app = FastAPI(lifespan=lifespan)
 
@@ -61,6 +75,11 @@ app = FastAPI(lifespan=lifespan)
 def health():
     return {"status": "ok", "model_loaded": True}
 
+@app.post("/config/reload")
+def reload_config():
+    """Pick up feature flag changes made to engine_config.json."""
+    return {"features": config.reload_features()}
+
 # ──────────────────────────────────────────────
 # Parse — replaces parse_pdf/docx/csv/json.py
 # ──────────────────────────────────────────────
@@ -82,14 +101,61 @@ PARSERS = {
     ".pptx": extract_text_from_pptx,
 }
 
+# Files at least this large are parsed in a worker process so CPU-bound
+# parsing runs outside the GIL; smaller ones aren't worth the IPC round trip
+PARSE_IN_PROCESS_MAX_BYTES = 64 * 1024
+
+_parse_pool = None
+
+def _get_parse_pool():
+    """Lazily start the parser process pool (spawned, so workers never inherit the model)."""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _parse_pool
+
+def _discard_parse_pool(pool):
+    """Drop a pool broken by a dead worker so the next parse starts a fresh one."""
+    global _parse_pool
+    if _parse_pool is pool:
+        _parse_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+async def _parse_in_pool(parser, file_path):
+    """
+    Run a parser in the process pool. A worker that dies (e.g. a segfault in a
+    native PDF library) breaks the whole pool, so it is replaced and the parse
+    retried once in a fresh pool. Never retried in-process: the file itself
+    may be what crashes the parser.
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = _get_parse_pool()
+        try:
+            return await loop.run_in_executor(pool, parser, file_path)
+        except BrokenProcessPool:
+            _discard_parse_pool(pool)
+            if attempt:
+                raise
+
 @app.post("/parse")
-def parse_file(req: ParseRequest):
+async def parse_file(req: ParseRequest):
     ext = os.path.splitext(req.file_path)[1].lower()
     parser = PARSERS.get(ext)
     if not parser:
         return {"success": False, "text": None, "error": f"Unsupported file type: {ext}"}
     try:
-        text = parser(req.file_path)
+        size = os.path.getsize(req.file_path)
+    except OSError:
+        size = 0  # let the parser report the error
+    try:
+        if size >= PARSE_IN_PROCESS_MAX_BYTES:
+            text = await _parse_in_pool(parser, req.file_path)
+        else:
+            text = await asyncio.get_running_loop().run_in_executor(None, parser, req.file_path)
         if text and text.startswith("Error"):
             return {"success": False, "text": None, "error": text}
         return {"success": True, "text": text}
@@ -108,8 +174,15 @@ class IndexRequest(BaseModel):
 def index_document(req: IndexRequest):
     try:
         chunk_count = store_document(req.file_path, req.content)
-        file_hash = get_file_hash(req.file_path)
-        return {"success": True, "file_hash": file_hash, "chunk_count": chunk_count}
+        stamp = get_file_stamp(req.file_path) or {}
+        return {
+            "success": True,
+            "file_hash": stamp.get("hash"),
+            "file_size": stamp.get("size"),
+            # Nanosecond mtimes overflow JS's safe integers; round-trip through Node as a string
+            "file_mtime_ns": str(stamp["mtime_ns"]) if stamp else None,
+            "chunk_count": chunk_count,
+        }
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -122,15 +195,40 @@ class SearchRequest(BaseModel):
     limit: int = 10
     options: Optional[dict] = None
 
+# Near-duplicate queries reuse the full pipeline output
+search_cache = SemanticCache()
+
+def _table_version():
+    """Current documents table version, or None before anything is indexed."""
+    try:
+        return vector_store.get_table().version
+    except Exception:
+        return None
+
 @app.post("/search")
-def search(req: SearchRequest):
+async def search(req: SearchRequest):
     query = req.query
     limit = req.limit
     options = req.options or {}
-
-    use_expansion = options.get("expansion", is_feature_enabled("query_expansion"))
-    use_hybrid = options.get("hybrid", is_feature_enabled("hybrid_search"))
-    use_reranker = options.get("reranker", is_feature_enabled("reranker"))
+    loop = asyncio.get_running_loop()
+
+    # Flags are read as config attributes so reload_features() takes effect
+    use_expansion = options.get("expansion", config.QUERY_EXPANSION)
+    use_hybrid = options.get("hybrid", config.HYBRID)
+    use_reranker = options.get("reranker", config.RERANKER)
+    use_cache = options.get("semantic_cache", config.SEMANTIC_CACHE)
+    use_ann_cache = options.get("ann_cache", config.ANN_CACHE)
+
+    # Step 0: Semantic cache — results for a near-identical earlier query
+    if use_cache:
+        cache_vector = await loop.run_in_executor(None, embed_query, query)
+        # The table version changes on every write, including ones made by the
+        # index worker or another process, which don't bump this cache's generation
+        version = await loop.run_in_executor(None, _table_version)
+        cache_key = (limit, use_expansion, use_hybrid, use_reranker, version)
+        cached = search_cache.get(cache_vector, cache_key, get_semantic_cache_threshold())
+        if cached is not None:
+            return cached
 
     meta = {
         "used_llm": False,
@@ -143,7 +241,7 @@ def search(req: SearchRequest):
     if use_expansion:
         try:
             from query_expand import expand_query
-            expansion = expand_query(query)
+            expansion = await loop.run_in_executor(None, expand_query, query)
             expanded_queries = expansion["queries"]
             meta["used_llm"] = expansion["used_llm"]
             meta["expanded_queries"] = expanded_queries
@@ -151,37 +249,49 @@ def search(req: SearchRequest):
         except Exception:
             pass
 
-    # Step 2: Vector Search per expanded query
-    all_vector_results = []
+    # Step 2: Vector Search per expanded query — one batched embedding call,
+    # then the ANN lookups run concurrently
     candidates_per_query = max(50, limit * 5)
-    for q in expanded_queries:
-        results = search_documents(q, candidates_per_query)
-        all_vector_results.extend(results)
-
-    merged = merge_vector_results(all_vector_results)
+    # The original query was already embedded for the cache lookup
+    embedded = {query: cache_vector} if use_cache else {}
+    missing = [q for q in expanded_queries if q not in embedded]
+    if missing:
+        embedded.update(zip(missing, await loop.run_in_executor(None, embed_queries, missing)))
+    vectors = [embedded[q] for q in expanded_queries]
+    results_lists = await asyncio.gather(*(
+        loop.run_in_executor(None, search_by_vector, vector, candidates_per_query, use_ann_cache)
+        for vector in vectors
+    ))
+
+    # Each list comes back distance-sorted, so a k-way merge can dedup file+chunk
+    # on the fly and stop at the same depth a single query would return
+    merged = merge_vector_streams(results_lists, candidates_per_query)
 
     # Step 3: Hybrid BM25 + RRF
     if use_hybrid and merged:
         try:
             from hybrid_search import hybrid_merge
-            merged = hybrid_merge(query, merged, top_n=limit * 3)
+            merged = await loop.run_in_executor(None, hybrid_merge, query, merged, limit * 3)
         except Exception:
             pass
 
     # Step 4: Deduplicate
     deduplicated = deduplicate_results(merged, limit * 2)
 
-    # Step 5: Rerank
-    if use_reranker and deduplicated:
+    # Step 5: Rerank — skipped when the vector distances are already decisive
+    if use_reranker and deduplicated and not rerank_unnecessary(deduplicated):
         try:
             from reranker import rerank
-            deduplicated = rerank(query, deduplicated, top_n=limit)
+            deduplicated = await loop.run_in_executor(None, rerank, query, deduplicated, limit)
         except Exception:
             deduplicated = deduplicated[:limit]
     else:
         deduplicated = deduplicated[:limit]
 
-    return {"results": deduplicated, "meta": meta}
+    response = {"results": deduplicated, "meta": meta}
+    if use_cache:
+        search_cache.put(cache_vector, cache_key, response)
+    return response
 
 # ──────────────────────────────────────────────
 # Metadata — replaces index_metadata.py CLI
@@ -202,8 +312,10 @@ class MetadataUpdateRequest(BaseModel):
     files_metadata: dict
 
 @app.post("/metadata/update")
-def metadata_update(req: MetadataUpdateRequest):
+def metadata_update(req: MetadataUpdateRequest, background_tasks: BackgroundTasks):
     update_index_metadata(req.folder_path, req.files_metadata)
+    # Node calls this once a folder finishes indexing; refresh the ANN index after responding
+    background_tasks.add_task(vector_store.ensure_vector_index)
     return {"success": True}
 
 
@@ -258,9 +370,10 @@ def remove_connector(connector_id: str):
 
     # Clean up vector store entries BEFORE files are deleted
     if items_folder and os.path.exists(items_folder):
-        for f in os.listdir(items_folder):
-            if f.endswith(".txt"):
-                delete_document(os.path.join(items_folder, f))
+        with os.scandir(items_folder) as it:
+            for entry in it:
+                if entry.name.endswith(".txt"):
+                    delete_document(entry.path)
 
     # Remove connector (deletes files + config entry)
     connector_registry.remove_connector(connector_id)
@@ -276,6 +389,10 @@ def remove_connector(connector_id: str):
 
     return {"success": True}
 
+# Static framing for progress events; only the message itself is JSON-encoded
+_PROGRESS_PREFIX = b'data: {"type": "progress", "message": '
+_EVENT_SUFFIX = b'}\n\n'
+
 @app.post("/connectors/{connector_id}/sync")
 async def trigger_sync(connector_id: str):
     """Trigger a manual sync with SSE progress streaming."""
@@ -284,19 +401,27 @@ async def trigger_sync(connector_id: str):
         raise HTTPException(status_code=404, detail="Connector not found")
 
     async def event_stream():
-        messages = []
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
 
         def progress_cb(msg):
-            messages.append(msg)
+            # Called from the IMAP worker thread as well as the event loop
+            loop.call_soon_threadsafe(queue.put_nowait, msg)
 
-        result = await sync_connector(connector_id, progress_callback=progress_cb)
+        task = loop.create_task(sync_connector(connector_id, progress_callback=progress_cb))
+        # None marks the end; it is queued after every progress message already sent
+        task.add_done_callback(lambda _: queue.put_nowait(None))
 
-        # Send progress messages
-        for msg in messages:
-            yield f"data: {json.dumps({'type': 'progress', 'message': msg})}\n\n"
+        # Send progress messages as they happen
+        while True:
+            msg = await queue.get()
+            if msg is None:
+                break
+            yield _PROGRESS_PREFIX + json.dumps(msg).encode() + _EVENT_SUFFIX
 
         # Send final result
-        yield f"data: {json.dumps({'type': 'complete', **result})}\n\n"
+        result = task.result()
+        yield f"data: {json.dumps({'type': 'complete', **result})}\n\n".encode()
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
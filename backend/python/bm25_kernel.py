@@ -0,0 +1,51 @@
+"""
+Numba-compiled BM25 scoring kernel.
+Optional: if numba is not installed, AVAILABLE is False and bm25_search
+falls back to its NumPy path.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    AVAILABLE = True
+except ImportError:
+    AVAILABLE = False
+
+
+if AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def score(term_ids, query_idf, offsets, doc_ids, tfs, doc_len, avg_dl, k1, b, scores):
+        """
+        Accumulate BM25 scores for the given query terms into scores (in place).
+
+        Postings are in CSR layout: term t owns doc_ids/tfs[offsets[t]:offsets[t + 1]].
+        A document appears at most once per term, so the inner parallel loop
+        never writes the same score slot twice.
+        """
+        for q in range(term_ids.shape[0]):
+            t = term_ids[q]
+            idf = query_idf[q]
+            for p in prange(offsets[t], offsets[t + 1]):
+                d = doc_ids[p]
+                tf = tfs[p]
+                scores[d] += idf * (tf * (k1 + 1)) / (tf + k1 * (1 - b + b * doc_len[d] / avg_dl))
+
+
+def warmup():
+    """Compile (or load the cached) kernel so the first search doesn't pay for it."""
+    if not AVAILABLE:
+        return
+    scores = np.zeros(1, dtype=np.float32)
+    score(
+        np.zeros(1, dtype=np.int32),
+        np.ones(1, dtype=np.float32),
+        np.array([0, 1], dtype=np.int64),
+        np.zeros(1, dtype=np.int32),
+        np.ones(1, dtype=np.float32),
+        np.ones(1, dtype=np.float32),
+        np.float32(1.0),
+        np.float32(1.5),
+        np.float32(0.75),
+        scores,
+    )
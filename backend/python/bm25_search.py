@@ -1,20 +1,96 @@
 """
-BM25 keyword search implementation using only stdlib.
-Simple tokenizer + TF-IDF style scoring.
+BM25 keyword search implementation.
+Simple tokenizer + TF-IDF style scoring over a cached inverted index,
+vectorized with NumPy per query term.
 """
 
-import math
 import re
-from collections import Counter
+import threading
+from collections import Counter, OrderedDict
 
+import numpy as np
 
-def tokenize(text):
-    """Simple tokenizer: lowercase, split on non-alphanumeric, remove stopwords."""
-    tokens = re.findall(r'[a-zA-Z0-9]+', text.lower())
-    return [t for t in tokens if t not in _STOPWORDS and len(t) > 1]
+import bm25_kernel
+
+# Above this many postings for a query, use the compiled kernel when available
+KERNEL_MIN_POSTINGS = 20_000
+
+
+# Alphanumeric runs of 2+ characters (single-character tokens are dropped)
+_TOKEN_RE = re.compile(r'[a-zA-Z0-9]{2,}')
 
 
-def bm25_search(query, documents, top_n=20):
+def tokenize(text):
+    """Simple tokenizer: lowercase, split on non-alphanumeric, remove stopwords."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """Inverted index over a document list: term postings plus document lengths."""
+
+    def __init__(self, documents):
+        term_docs = {}
+        term_tfs = {}
+        doc_lengths = []
+
+        for doc_id, doc in enumerate(documents):
+            tokens = tokenize(doc.get("text", ""))
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_docs.setdefault(term, []).append(doc_id)
+                term_tfs.setdefault(term, []).append(tf)
+
+        # Postings in CSR layout: term id t owns doc_ids/tfs[offsets[t]:offsets[t + 1]]
+        self.vocab = {term: i for i, term in enumerate(term_docs)}
+        lengths = [len(ids) for ids in term_docs.values()]
+        self.offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.doc_ids = np.fromiter(
+            (d for ids in term_docs.values() for d in ids), dtype=np.int32, count=int(self.offsets[-1])
+        )
+        self.tfs = np.fromiter(
+            (tf for tfs in term_tfs.values() for tf in tfs), dtype=np.float32, count=int(self.offsets[-1])
+        )
+
+        self.doc_lengths = np.array(doc_lengths, dtype=np.float32)
+        self.num_docs = len(documents)
+        self.avg_dl = float(self.doc_lengths.mean()) if self.num_docs else 1.0
+
+    def term_id(self, term):
+        """Return the term's id, or None if no document contains it."""
+        return self.vocab.get(term)
+
+    def document_frequency(self, term_id):
+        """Number of documents containing the term."""
+        return int(self.offsets[term_id + 1] - self.offsets[term_id])
+
+
+# Recently built indexes, keyed by the caller-supplied corpus key
+_INDEX_CACHE_SIZE = 4
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def get_index(documents, corpus_key=None):
+    """Return a BM25Index for documents, reusing a cached one for the same corpus_key."""
+    if corpus_key is None:
+        return BM25Index(documents)
+
+    with _index_lock:
+        index = _index_cache.get(corpus_key)
+        if index is not None:
+            _index_cache.move_to_end(corpus_key)
+            return index
+
+    index = BM25Index(documents)
+    with _index_lock:
+        _index_cache[corpus_key] = index
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def bm25_search(query, documents, top_n=20, corpus_key=None):
     """
     BM25 keyword search over a list of documents.
 
@@ -22,6 +98,8 @@ def bm25_search(query, documents, top_n=20):
         query: search query string
         documents: list of dicts with 'text' field (and any other fields)
         top_n: number of results to return
+        corpus_key: hashable identity of documents; when given, the inverted
+            index is built once and reused for later queries with the same key
 
     Returns:
         list of (index, score) tuples sorted by score descending
@@ -33,62 +111,60 @@ def bm25_search(query, documents, top_n=20):
     if not query_tokens:
         return []
 
-    # Tokenize all documents
-    doc_tokens = [tokenize(doc.get("text", "")) for doc in documents]
-
-    # Calculate document lengths and average
-    doc_lengths = [len(dt) for dt in doc_tokens]
-    avg_dl = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 1
-
-    N = len(documents)
-
-    # Document frequency for each query term
-    df = Counter()
-    for tokens in doc_tokens:
-        unique = set(tokens)
-        for token in query_tokens:
-            if token in unique:
-                df[token] += 1
+    index = get_index(documents, corpus_key)
+    N = index.num_docs
+    avg_dl = index.avg_dl
+    doc_lengths = index.doc_lengths
 
     # BM25 parameters
     k1 = 1.5
     b = 0.75
 
-    # Score each document
-    scores = []
-    for i, tokens in enumerate(doc_tokens):
-        if not tokens:
-            scores.append(0.0)
+    # Resolve query terms and their IDF once. A term repeated in the query
+    # keeps the original scoring: its document frequency is counted once per
+    # occurrence and it contributes once per occurrence.
+    term_ids = []
+    idfs = []
+    num_postings = 0
+    for term, occurrences in Counter(query_tokens).items():
+        t = index.term_id(term)
+        if t is None:
             continue
-
-        tf = Counter(tokens)
-        score = 0.0
-
-        for term in query_tokens:
-            if term not in tf:
-                continue
-
-            # IDF component
-            n = df.get(term, 0)
-            idf = math.log((N - n + 0.5) / (n + 0.5) + 1)
-
-            # TF component with length normalization
-            term_freq = tf[term]
-            tf_norm = (term_freq * (k1 + 1)) / (term_freq + k1 * (1 - b + b * doc_lengths[i] / avg_dl))
-
-            score += idf * tf_norm
-
-        scores.append(score)
-
-    # Get top N by score
-    indexed_scores = [(i, s) for i, s in enumerate(scores) if s > 0]
-    indexed_scores.sort(key=lambda x: x[1], reverse=True)
-
-    return indexed_scores[:top_n]
+        docs = index.document_frequency(t)
+        n = docs * occurrences
+        term_ids.append(t)
+        idfs.append(occurrences * np.log((N - n + 0.5) / (n + 0.5) + 1))
+        num_postings += docs
+
+    # Only documents containing a query term are ever touched
+    scores = np.zeros(N, dtype=np.float32)
+    if bm25_kernel.AVAILABLE and num_postings >= KERNEL_MIN_POSTINGS:
+        bm25_kernel.score(
+            np.array(term_ids, dtype=np.int32), np.array(idfs, dtype=np.float32),
+            index.offsets, index.doc_ids, index.tfs, doc_lengths,
+            np.float32(avg_dl), np.float32(k1), np.float32(b), scores,
+        )
+    else:
+        offsets = index.offsets
+        for t, idf in zip(term_ids, idfs):
+            ids = index.doc_ids[offsets[t]:offsets[t + 1]]
+            tfs = index.tfs[offsets[t]:offsets[t + 1]]
+
+            # TF component with length normalization (doc ids are unique per term)
+            tf_norm = (tfs * (k1 + 1)) / (tfs + k1 * (1 - b + b * doc_lengths[ids] / avg_dl))
+            scores[ids] += np.float32(idf) * tf_norm
+
+    # Get top N by score: O(N) partial selection, then sort only the winners
+    matched = np.flatnonzero(scores > 0)
+    if top_n < len(matched):
+        matched = np.sort(matched[np.argpartition(-scores[matched], top_n - 1)[:top_n]])
+    order = matched[np.argsort(-scores[matched], kind="stable")]
+
+    return [(int(i), float(scores[i])) for i in order]
 
 
 # Common English stopwords
-_STOPWORDS = {
+_STOPWORDS = frozenset({
     "a", "an", "the", "and", "or", "but", "in", "on", "at", "to", "for",
     "of", "with", "by", "from", "as", "is", "was", "are", "were", "be",
     "been", "being", "have", "has", "had", "do", "does", "did", "will",
@@ -102,4 +178,4 @@ _STOPWORDS = {
     "these", "they", "this", "those", "through", "under", "until", "up",
     "we", "what", "when", "where", "which", "while", "who", "whom",
     "why", "you", "your",
-}
+})
@@ -8,25 +8,44 @@ import re
 CHUNK_SIZE = 2000       # ~512 tokens target
 CHUNK_OVERLAP = 200     # overlap between chunks for context continuity
 
+_PARA_SPLIT = re.compile(r'\n\s*\n')
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_SENT_BREAK = re.compile(r'[.!?]\s+')
+
 
 def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
     """
     Split text into overlapping chunks, breaking at paragraph/sentence boundaries.
     Returns list of {text, chunk_index, total_chunks}.
     """
+    chunks = split_text(text, chunk_size, overlap)
+    total = len(chunks)
+    return [
+        {"text": c, "chunk_index": i, "total_chunks": total}
+        for i, c in enumerate(chunks)
+    ]
+
+
+def split_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Like chunk_text, but returns just the chunk strings in order; a chunk's
+    index is its position and total_chunks is the list length.
+    """
     text = text.strip()
     if not text:
         return []
 
     # If text fits in one chunk, return as-is
     if len(text) <= chunk_size:
-        return [{"text": text, "chunk_index": 0, "total_chunks": 1}]
+        return [text]
 
     # Split into paragraphs first
-    paragraphs = re.split(r'\n\s*\n', text)
+    paragraphs = _PARA_SPLIT.split(text)
 
     chunks = []
-    current_chunk = ""
+    # Current chunk is "\n\n".join(current_parts); joined only when flushed
+    current_parts = []
+    current_len = 0
 
     for para in paragraphs:
         para = para.strip()
@@ -34,36 +53,42 @@ def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
             continue
 
         # If adding this paragraph exceeds chunk size
-        if len(current_chunk) + len(para) + 2 > chunk_size:
-            if current_chunk:
+        if current_len + len(para) + 2 > chunk_size:
+            if current_len:
+                current_chunk = "\n\n".join(current_parts)
                 chunks.append(current_chunk.strip())
 
                 # Start next chunk with overlap from end of current
                 overlap_text = _get_overlap(current_chunk, overlap)
-                current_chunk = overlap_text + "\n\n" + para if overlap_text else para
+                if overlap_text:
+                    current_parts = [overlap_text, para]
+                    current_len = len(overlap_text) + 2 + len(para)
+                else:
+                    current_parts = [para]
+                    current_len = len(para)
             else:
                 # Single paragraph exceeds chunk size - split by sentences
                 sentence_chunks = _split_long_paragraph(para, chunk_size, overlap)
                 if sentence_chunks:
                     chunks.extend(sentence_chunks[:-1])
-                    current_chunk = sentence_chunks[-1]
+                    current_parts = [sentence_chunks[-1]]
                 else:
-                    current_chunk = para
+                    current_parts = [para]
+                current_len = len(current_parts[0])
         else:
-            if current_chunk:
-                current_chunk += "\n\n" + para
+            if current_len:
+                current_parts.append(para)
+                current_len += 2 + len(para)
             else:
-                current_chunk = para
+                current_parts = [para]
+                current_len = len(para)
 
     # Don't forget the last chunk
+    current_chunk = "\n\n".join(current_parts)
     if current_chunk.strip():
         chunks.append(current_chunk.strip())
 
-    total = len(chunks)
-    return [
-        {"text": c, "chunk_index": i, "total_chunks": total}
-        for i, c in enumerate(chunks)
-    ]
+    return chunks
 
 
 def _get_overlap(text, overlap_chars):
@@ -73,7 +98,7 @@ def _get_overlap(text, overlap_chars):
 
     tail = text[-overlap_chars:]
     # Try to break at sentence boundary
-    sentence_break = re.search(r'[.!?]\s+', tail)
+    sentence_break = _SENT_BREAK.search(tail)
     if sentence_break:
         return tail[sentence_break.end():]
     # Fall back to word boundary
@@ -86,25 +111,40 @@ def _get_overlap(text, overlap_chars):
 def _split_long_paragraph(text, chunk_size, overlap):
     """Split a single long paragraph by sentence boundaries."""
     # Split into sentences
-    sentences = re.split(r'(?<=[.!?])\s+', text)
+    sentences = _SENT_SPLIT.split(text)
 
     chunks = []
-    current = ""
+    # Current chunk is " ".join(current_parts); joined only when flushed
+    current_parts = []
+    current_len = 0
 
     for sentence in sentences:
-        if len(current) + len(sentence) + 1 > chunk_size:
-            if current:
+        if current_len + len(sentence) + 1 > chunk_size:
+            if current_len:
+                current = " ".join(current_parts)
                 chunks.append(current.strip())
                 overlap_text = _get_overlap(current, overlap)
-                current = overlap_text + " " + sentence if overlap_text else sentence
+                if overlap_text:
+                    current_parts = [overlap_text, sentence]
+                    current_len = len(overlap_text) + 1 + len(sentence)
+                else:
+                    current_parts = [sentence]
+                    current_len = len(sentence)
             else:
                 # Single sentence exceeds chunk size - hard split
                 for i in range(0, len(sentence), chunk_size - overlap):
                     chunks.append(sentence[i:i + chunk_size])
-                current = ""
+                current_parts = []
+                current_len = 0
         else:
-            current = current + " " + sentence if current else sentence
+            if current_len:
+                current_parts.append(sentence)
+                current_len += 1 + len(sentence)
+            else:
+                current_parts = [sentence]
+                current_len = len(sentence)
 
+    current = " ".join(current_parts)
     if current.strip():
         chunks.append(current.strip())
 
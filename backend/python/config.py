@@ -5,6 +5,7 @@ Reads/writes storage/engine_config.json.
 
 import json
 import os
+import threading
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "storage", "engine_config.json")
 
@@ -22,32 +23,63 @@ MODELS = {
 
 DEFAULTS = {
     "embedding_model": "all-MiniLM-L6-v2",
+    "embedding_dtype": "float16",
+    "embedding_backend": "torch",
+    "reranker_backend": "torch",
+    "reranker_max_length": 256,
+    "torch_threads": 0,
+    "ann_cache_threshold": 0.97,
+    "embedding_cache_max_entries": 200000,
     "engine_version": 2,
     "features": {
         "chunking": True,
         "reranker": True,
         "query_expansion": True,
         "hybrid_search": True,
+        "semantic_cache": True,
+        "semantic_cache_threshold": 0.85,
+        "ann_cache": True,
+        "rerank_skip": True,
     },
+    "rerank_skip_distance": 0.1,
+    "rerank_skip_margin": 0.05,
 }
 
 
+# Parsed config, reused until the file's mtime/size changes (Node also writes it)
+_cache = {"stamp": None, "data": None}
+_cache_lock = threading.Lock()
+
+
 def _load_config():
-    """Load config from disk, or return defaults."""
-    if os.path.exists(CONFIG_PATH):
+    """Load config from disk, or return defaults. Callers must not mutate the result."""
+    try:
+        stat = os.stat(CONFIG_PATH)
+    except OSError:
+        return dict(DEFAULTS)
+
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        if _cache["stamp"] == stamp:
+            return _cache["data"]
         try:
             with open(CONFIG_PATH, "r") as f:
-                return json.load(f)
+                data = json.load(f)
         except (json.JSONDecodeError, IOError):
-            pass
-    return dict(DEFAULTS)
+            return dict(DEFAULTS)
+        _cache["stamp"] = stamp
+        _cache["data"] = data
+        return data
 
 
 def _save_config(config):
     """Write config to disk."""
     os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(config, f, indent=2)
+    with _cache_lock:
+        with open(CONFIG_PATH, "w") as f:
+            json.dump(config, f, indent=2)
+        _cache["stamp"] = None
+    reload_features()
 
 
 def get_embedding_model():
@@ -67,6 +99,40 @@ def get_dimensions():
     return MODELS.get(model, MODELS["all-MiniLM-L6-v2"])["dimensions"]
 
 
+def get_embedding_dtype():
+    """Return the storage precision for vectors in newly created tables ("float16" or "float32")."""
+    dtype = _load_config().get("embedding_dtype", DEFAULTS["embedding_dtype"])
+    return dtype if dtype in ("float16", "float32") else DEFAULTS["embedding_dtype"]
+
+
+def get_embedding_backend():
+    """Return the inference backend for the embedding model ("torch" or "onnx")."""
+    backend = _load_config().get("embedding_backend", DEFAULTS["embedding_backend"])
+    return backend if backend in ("torch", "onnx") else DEFAULTS["embedding_backend"]
+
+
+def get_reranker_backend():
+    """Return the inference backend for the cross-encoder reranker ("torch" or "onnx")."""
+    backend = _load_config().get("reranker_backend", DEFAULTS["reranker_backend"])
+    return backend if backend in ("torch", "onnx") else DEFAULTS["reranker_backend"]
+
+
+def get_reranker_max_length():
+    """Return the token limit (query + passage) the cross-encoder truncates pairs to."""
+    length = _load_config().get("reranker_max_length", DEFAULTS["reranker_max_length"])
+    if isinstance(length, int) and 0 < length <= 512:
+        return length
+    return DEFAULTS["reranker_max_length"]
+
+
+def get_torch_threads():
+    """Return the intra-op thread count for PyTorch inference (0 means every core)."""
+    threads = _load_config().get("torch_threads", DEFAULTS["torch_threads"])
+    if isinstance(threads, int) and threads > 0:
+        return threads
+    return os.cpu_count() or 1
+
+
 def get_engine_version():
     """Return the current engine version."""
     return _load_config().get("engine_version", DEFAULTS["engine_version"])
@@ -78,10 +144,69 @@ def get_feature_flags():
     return config.get("features", DEFAULTS["features"])
 
 
+# Feature flags snapshot, read once at import; refresh with reload_features()
+FEATURES = {}
+QUERY_EXPANSION = False
+HYBRID = False
+RERANKER = False
+SEMANTIC_CACHE = False
+ANN_CACHE = False
+
+
+def reload_features():
+    """Re-read feature flags from disk into the module-level snapshot."""
+    global FEATURES, QUERY_EXPANSION, HYBRID, RERANKER, SEMANTIC_CACHE, ANN_CACHE
+    FEATURES = dict(get_feature_flags())
+    QUERY_EXPANSION = FEATURES.get("query_expansion", False)
+    HYBRID = FEATURES.get("hybrid_search", False)
+    RERANKER = FEATURES.get("reranker", False)
+    SEMANTIC_CACHE = FEATURES.get("semantic_cache", False)
+    ANN_CACHE = FEATURES.get("ann_cache", False)
+    return FEATURES
+
+
 def is_feature_enabled(feature_name):
     """Check if a specific feature is enabled."""
-    flags = get_feature_flags()
-    return flags.get(feature_name, False)
+    return FEATURES.get(feature_name, False)
+
+
+def get_semantic_cache_threshold():
+    """Return the cosine similarity at which a cached query result is reused."""
+    return FEATURES.get("semantic_cache_threshold", DEFAULTS["features"]["semantic_cache_threshold"])
+
+
+def get_ann_cache_threshold():
+    """Return the cosine similarity at which cached raw ANN hits are reused for a query embedding.
+
+    Much stricter than semantic_cache_threshold: expanded sub-queries are
+    paraphrases of each other and must still get their own ANN hits.
+    """
+    threshold = _load_config().get("ann_cache_threshold", DEFAULTS["ann_cache_threshold"])
+    if isinstance(threshold, (int, float)) and 0 < threshold <= 1:
+        return threshold
+    return DEFAULTS["ann_cache_threshold"]
+
+
+def get_embedding_cache_max_entries():
+    """Return how many chunk embeddings the on-disk cache keeps before evicting the least recently used."""
+    value = _load_config().get("embedding_cache_max_entries", DEFAULTS["embedding_cache_max_entries"])
+    if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+        return value
+    return DEFAULTS["embedding_cache_max_entries"]
+
+
+def get_rerank_skip_thresholds():
+    """Return (max top distance, min gap to the runner-up) at which the rerank_skip
+    feature skips the cross-encoder.
+
+    Distances are dot-product distances (1 - cosine similarity).
+    """
+    config = _load_config()
+    thresholds = []
+    for key in ("rerank_skip_distance", "rerank_skip_margin"):
+        value = config.get(key, DEFAULTS[key])
+        thresholds.append(value if isinstance(value, (int, float)) and value >= 0 else DEFAULTS[key])
+    return tuple(thresholds)
 
 
 def needs_reindex():
@@ -93,7 +218,7 @@ def needs_reindex():
 
 def mark_reindex_complete():
     """Mark that reindexing has been done for the current engine version."""
-    config = _load_config()
+    config = dict(_load_config())
     config["last_indexed_version"] = DEFAULTS["engine_version"]
     _save_config(config)
 
@@ -103,3 +228,6 @@ def init_config():
     if not os.path.exists(CONFIG_PATH):
         _save_config(DEFAULTS)
     return _load_config()
+
+
+reload_features()
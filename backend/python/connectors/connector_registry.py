@@ -5,8 +5,10 @@ Config is persisted in backend/storage/connectors/connectors_config.json.
 """
 
 import os
+import copy
 import json
 import uuid
+import threading
 from datetime import datetime
 
 
@@ -19,6 +21,10 @@ _connector_classes = {}
 # Live connector instances: { connector_id: instance }
 _connector_instances = {}
 
+# Parsed config, reused until the file's mtime/size changes
+_cfg_cache = {"stamp": None, "data": None}
+_cfg_lock = threading.Lock()
+
 
 def register(type_name: str, cls):
     """Register a connector class by type name."""
@@ -31,18 +37,30 @@ def get_available_types() -> list:
 
 
 def _load_config() -> dict:
-    """Load persisted connector config from disk."""
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r") as f:
-            return json.load(f)
-    return {"connectors": []}
+    """Load persisted connector config (a private copy; safe to mutate)."""
+    try:
+        stat = os.stat(CONFIG_FILE)
+    except OSError:
+        return {"connectors": []}
+
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _cfg_lock:
+        if _cfg_cache["stamp"] != stamp:
+            with open(CONFIG_FILE, "r") as f:
+                _cfg_cache["data"] = json.load(f)
+            _cfg_cache["stamp"] = stamp
+        return copy.deepcopy(_cfg_cache["data"])
 
 
 def _save_config(config: dict):
-    """Save connector config to disk."""
+    """Save connector config to disk atomically (write temp file, then rename)."""
     os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=2)
+    tmp_path = CONFIG_FILE + ".tmp"
+    with _cfg_lock:
+        with open(tmp_path, "w") as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp_path, CONFIG_FILE)
+        _cfg_cache["stamp"] = None
 
 
 def _instantiate(entry: dict):
@@ -136,7 +154,12 @@ def list_connectors() -> list:
     cfg = _load_config()
     results = []
     for entry in cfg["connectors"]:
-        instance = get_connector(entry["id"])
+        # Live instances first; only instantiate entries not seen yet
+        instance = _connector_instances.get(entry["id"])
+        if instance is None:
+            instance = _instantiate(entry)
+            if instance:
+                _connector_instances[entry["id"]] = instance
         if instance:
             results.append(instance.get_status())
         else:
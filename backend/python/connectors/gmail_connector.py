@@ -6,16 +6,53 @@ Credentials: { imap_server, email, password }
 Incremental sync via UID high-water mark per folder.
 """
 
+import codecs
 import imaplib
 import email
+import html
 from email.header import decode_header
 import os
 import re
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 from connectors.base_connector import BaseConnector, ConnectorStatus
 
+# Optional C HTML parser for _strip_html; regex stripping otherwise
+try:
+    from selectolax.parser import HTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    HAS_SELECTOLAX = False
+
 MAX_EMAILS_PER_SYNC = 200
+FETCH_BATCH_SIZE = 50
+
+# Only headers and the first MAX_BODY_BYTES of the body are downloaded. Text
+# parts come first in practice, so large attachments are never transferred.
+# A body cut at the limit loses its incomplete last line before parsing.
+MAX_BODY_BYTES = 512 * 1024
+FETCH_ITEMS = f"(BODY.PEEK[HEADER] BODY.PEEK[TEXT]<0.{MAX_BODY_BYTES}>)"
+
+# Email files are written relative to an open directory fd where the OS supports it
+_DIR_FD_WRITES = os.open in os.supports_dir_fd and hasattr(os, "O_DIRECTORY")
+
+# HTML stripping patterns for HTML-only emails
+_RE_STYLE = re.compile(r"<style[^>]*>.*?</style>", re.DOTALL | re.IGNORECASE)
+_RE_SCRIPT = re.compile(r"<script[^>]*>.*?</script>", re.DOTALL | re.IGNORECASE)
+_RE_TAG = re.compile(r"<[^>]+>")
+_RE_WS = re.compile(r"\s+")
+
+# Filename sanitizing: characters outside [\w\s-] are dropped; ASCII subjects
+# take a str.translate fast path built from the same pattern
+_RE_UNSAFE = re.compile(r'[^\w\s-]')
+_UNSAFE_ASCII = {c: None for c in range(128) if _RE_UNSAFE.match(chr(c))}
+
+# FETCH response pieces, e.g. b'3 (UID 1234 BODY[HEADER] {5678}' then b' BODY[TEXT]<0> {910}'
+_RE_FETCH_START = re.compile(rb"\d+ \(")
+_RE_FETCH_UID = re.compile(rb"UID (\d+)")
+_RE_FETCH_SECTION = re.compile(rb"BODY\[([^\]]*)\]")
 
 
 def _decode_header_value(value):
@@ -34,49 +71,78 @@ def _decode_header_value(value):
 
 def _strip_html(html_text):
     """Basic HTML tag stripping as fallback for HTML-only emails."""
-    text = re.sub(r"<style[^>]*>.*?</style>", "", html_text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r"<script[^>]*>.*?</script>", "", text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r"<[^>]+>", " ", text)
-    text = re.sub(r"&nbsp;", " ", text)
-    text = re.sub(r"&amp;", "&", text)
-    text = re.sub(r"&lt;", "<", text)
-    text = re.sub(r"&gt;", ">", text)
-    text = re.sub(r"\s+", " ", text).strip()
+    if HAS_SELECTOLAX:
+        try:
+            tree = HTMLParser(html_text)
+            tree.strip_tags(["style", "script"])
+            if tree.root is not None:
+                return " ".join(tree.root.text(separator=" ").split())
+        except Exception:
+            pass  # fall through to the regex path
+
+    text = _RE_STYLE.sub("", html_text)
+    text = _RE_SCRIPT.sub("", text)
+    text = _RE_TAG.sub(" ", text)
+    # Decode all entities at once; &nbsp; becomes U+00A0, which \s collapses below
+    text = html.unescape(text)
+    text = _RE_WS.sub(" ", text).strip()
     return text
 
 
-def _extract_body(msg):
-    """Extract plain text body from an email message."""
+def _decode_part(part, cut=False):
+    """
+    Decode a text part's payload to str.
+
+    cut marks the part a partial fetch ended inside; a multibyte character
+    split at its end (base64 lines needn't end on a character) is left out
+    instead of replaced.
+    """
+    charset = part.get_content_charset() or "utf-8"
+    if not cut:
+        return part.get_payload(decode=True).decode(charset, errors="replace")
+    return codecs.getincrementaldecoder(charset)(errors="replace").decode(part.get_payload(decode=True))
+
+
+def _extract_body(msg, truncated=False):
+    """Extract plain text body from an email message; truncated if its body was cut by the fetch."""
     if msg.is_multipart():
+        # Without a closing boundary, the last part runs to the end of the cut body
+        cut_part = None
+        if truncated:
+            *_, cut_part = msg.walk()
         plain_parts = []
-        html_parts = []
+        html_candidates = []
         for part in msg.walk():
+            # Cheap content-type check first; images and containers never touch the disposition
             content_type = part.get_content_type()
+            if content_type != "text/plain" and content_type != "text/html":
+                continue
             disposition = str(part.get("Content-Disposition", ""))
             if "attachment" in disposition:
                 continue
             if content_type == "text/plain":
                 try:
-                    charset = part.get_content_charset() or "utf-8"
-                    plain_parts.append(part.get_payload(decode=True).decode(charset, errors="replace"))
-                except Exception:
-                    pass
-            elif content_type == "text/html":
-                try:
-                    charset = part.get_content_charset() or "utf-8"
-                    html_parts.append(part.get_payload(decode=True).decode(charset, errors="replace"))
+                    plain_parts.append(_decode_part(part, part is cut_part))
                 except Exception:
                     pass
+            else:
+                # Decoded only if there turns out to be no plain-text part
+                html_candidates.append(part)
         if plain_parts:
             return "\n".join(plain_parts)
+        html_parts = []
+        for part in html_candidates:
+            try:
+                html_parts.append(_decode_part(part, part is cut_part))
+            except Exception:
+                pass
         if html_parts:
             return _strip_html("\n".join(html_parts))
         return ""
     else:
         content_type = msg.get_content_type()
         try:
-            charset = msg.get_content_charset() or "utf-8"
-            payload = msg.get_payload(decode=True).decode(charset, errors="replace")
+            payload = _decode_part(msg, truncated)
         except Exception:
             return ""
         if content_type == "text/html":
@@ -84,10 +150,100 @@ def _extract_body(msg):
         return payload
 
 
+def _parse_fetch_response(msg_data):
+    """
+    Yield (uid, raw_bytes, truncated) for each message in a multi-UID FETCH response.
+
+    Each message arrives as one (header, literal) tuple per requested section
+    followed by a closing bytes item; the UID may be reported in any of them.
+    The HEADER and TEXT sections are concatenated back into a raw message;
+    truncated is True when the TEXT section filled the whole partial fetch.
+    """
+    uid = None
+    sections = None
+    for item in msg_data:
+        if isinstance(item, tuple):
+            head, literal = item
+            if _RE_FETCH_START.match(head):
+                if sections is not None and uid is not None:
+                    yield _fetched_message(uid, sections)
+                uid, sections = None, {}
+            if sections is None:
+                continue
+            section = _RE_FETCH_SECTION.search(head)
+            sections[section.group(1) if section else b"TEXT"] = literal
+        elif sections is None:
+            continue
+        else:
+            head = item
+        match = _RE_FETCH_UID.search(head)
+        if match:
+            uid = int(match.group(1))
+    if sections is not None and uid is not None:
+        yield _fetched_message(uid, sections)
+
+
+def _fetched_message(uid, sections):
+    """
+    Reassemble one message's fetched sections into (uid, raw_bytes, truncated).
+
+    A cut body ends mid-line: half a base64 group, a split quoted-printable
+    escape or character, or the start of a closing boundary. That last line
+    is dropped so the parser only sees whole lines.
+    """
+    text = sections.get(b"TEXT", b"")
+    truncated = len(text) >= MAX_BODY_BYTES
+    if truncated:
+        end = text.rfind(b"\n")
+        if end >= 0:
+            text = text[:end + 1]
+    return uid, sections.get(b"HEADER", b"") + text, truncated
+
+
+def _open_items_dir(items_folder):
+    """Open a directory fd for dir_fd-relative writes, or None where unsupported."""
+    if not _DIR_FD_WRITES:
+        return None
+    return os.open(items_folder, os.O_RDONLY | os.O_DIRECTORY)
+
+
+def _write_item(items_folder, filename, content, dirfd=None):
+    """Write an email .txt file, relative to dirfd when one is open."""
+    if dirfd is None:
+        with open(os.path.join(items_folder, filename), "w", encoding="utf-8") as f:
+            f.write(content)
+        return
+    data = memoryview(content.encode("utf-8"))
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dirfd)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+def _uid_set(uids):
+    """Format ascending UIDs as a compact IMAP UID set, e.g. "10:20,25,30:40"."""
+    parts = []
+    run_start = prev = uids[0]
+    for uid in uids[1:]:
+        if uid != prev + 1:
+            parts.append(f"{run_start}:{prev}" if prev != run_start else str(prev))
+            run_start = uid
+        prev = uid
+    parts.append(f"{run_start}:{prev}" if prev != run_start else str(prev))
+    return ",".join(parts)
+
+
 def _safe_filename(text, max_len=80):
     """Convert text to a safe filename."""
-    safe = re.sub(r'[^\w\s-]', '', text).strip()
-    safe = re.sub(r'\s+', '_', safe)
+    if text.isascii():
+        # Same result as the regex path: translate drops the disallowed ASCII
+        # characters, split/join collapses whitespace runs to "_"
+        safe = "_".join(text.translate(_UNSAFE_ASCII).split())
+    else:
+        safe = _RE_UNSAFE.sub('', text).strip()
+        safe = _RE_WS.sub('_', safe)
     return safe[:max_len] if safe else "no_subject"
 
 
@@ -131,6 +287,7 @@ class GmailConnector(BaseConnector):
         """
         Incremental sync: fetch emails newer than the last known UID per folder.
         Each email is saved as a .txt file in the items folder.
+        Folders sync concurrently, each over its own IMAP connection.
         """
         if not self._credentials:
             return {"new_items": 0, "total_items": 0, "errors": ["Not authenticated"]}
@@ -141,59 +298,108 @@ class GmailConnector(BaseConnector):
         items_folder = self.get_items_folder()
         new_items = 0
         errors = []
+        failures = []
+
+        with ThreadPoolExecutor(max_workers=len(self.FOLDERS)) as pool:
+            futures = [
+                pool.submit(self._sync_folder, folder, uid_watermarks.get(folder, 0), items_folder, progress_callback)
+                for folder in self.FOLDERS
+            ]
+            for future in as_completed(futures):
+                try:
+                    folder, folder_items, max_uid, folder_errors = future.result()
+                except Exception as e:
+                    failures.append(str(e))
+                    continue
+                new_items += folder_items
+                errors.extend(folder_errors)
+                if max_uid is not None:
+                    uid_watermarks[folder] = max_uid
 
-        try:
-            imap = imaplib.IMAP4_SSL(self._credentials["imap_server"])
-            imap.login(self._credentials["email"], self._credentials["password"])
-        except Exception as e:
+        if failures:
+            errors.extend(failures)
             self.status = ConnectorStatus.ERROR
-            self.last_error = str(e)
-            return {"new_items": 0, "total_items": 0, "errors": [str(e)]}
+            self.last_error = failures[0]
+            return {"new_items": new_items, "total_items": self._count_items(), "errors": errors}
+
+        # Save updated state
+        self.last_sync = datetime.now().isoformat()
+        self.items_synced = self._count_items()
+        self.status = ConnectorStatus.IDLE
+        self.last_error = None
+        self.save_state({
+            "uid_watermarks": uid_watermarks,
+            "last_sync": self.last_sync,
+            "items_synced": self.items_synced,
+        })
 
+        return {
+            "new_items": new_items,
+            "total_items": self.items_synced,
+            "errors": errors,
+        }
+
+    def _sync_folder(self, folder, last_uid, items_folder, progress_callback=None):
+        """
+        Fetch one folder's emails above last_uid over a dedicated IMAP connection.
+        Returns (folder, new_items, max_uid, errors); max_uid is None when the
+        folder was skipped. Connection-level failures raise.
+        """
+        imap = imaplib.IMAP4_SSL(self._credentials["imap_server"])
+        dirfd = None
         try:
-            for folder in self.FOLDERS:
-                try:
-                    status, _ = imap.select(folder, readonly=True)
-                    if status != "OK":
-                        continue
-                except Exception:
-                    continue
+            imap.login(self._credentials["email"], self._credentials["password"])
+            dirfd = _open_items_dir(items_folder)
 
-                if progress_callback:
-                    progress_callback(f"Syncing folder: {folder}")
+            try:
+                status, _ = imap.select(folder, readonly=True)
+                if status != "OK":
+                    return folder, 0, None, []
+            except Exception:
+                return folder, 0, None, []
 
-                # Get UIDs above the watermark
-                last_uid = uid_watermarks.get(folder, 0)
-                search_criteria = f"UID {last_uid + 1}:*"
-                status, data = imap.uid("search", None, search_criteria)
-                if status != "OK" or not data[0]:
-                    continue
+            if progress_callback:
+                progress_callback(f"Syncing folder: {folder}")
 
-                uids = data[0].split()
-                # Filter out UIDs <= watermark (IMAP may return the watermark itself)
-                uids = [u for u in uids if int(u) > last_uid]
+            # Get UIDs above the watermark
+            search_criteria = f"UID {last_uid + 1}:*"
+            status, data = imap.uid("search", None, search_criteria)
+            if status != "OK" or not data[0]:
+                return folder, 0, None, []
 
-                # Cap per sync
-                if len(uids) > MAX_EMAILS_PER_SYNC:
-                    uids = uids[:MAX_EMAILS_PER_SYNC]
+            # Parse UIDs once into a compact unsigned array, ascending so the cap
+            # keeps the oldest ones and the watermark never skips past unfetched mail.
+            # Filter out UIDs <= watermark (IMAP may return the watermark itself)
+            uids = array("Q", sorted(u for u in map(int, data[0].split()) if u > last_uid))
 
-                max_uid_this_folder = last_uid
+            # Cap per sync
+            if len(uids) > MAX_EMAILS_PER_SYNC:
+                uids = uids[:MAX_EMAILS_PER_SYNC]
 
-                for i, uid_bytes in enumerate(uids):
-                    uid = int(uid_bytes)
-                    try:
-                        status, msg_data = imap.uid("fetch", uid_bytes, "(RFC822)")
-                        if status != "OK" or not msg_data[0]:
-                            continue
+            new_items = 0
+            errors = []
+            max_uid_this_folder = last_uid
 
-                        raw_email = msg_data[0][1]
+            # Fetch in UID-set batches: one IMAP round trip per FETCH_BATCH_SIZE emails
+            for start in range(0, len(uids), FETCH_BATCH_SIZE):
+                batch = uids[start:start + FETCH_BATCH_SIZE]
+                try:
+                    status, msg_data = imap.uid("fetch", _uid_set(batch), FETCH_ITEMS)
+                except Exception as e:
+                    errors.append(f"UIDs {batch[0]}-{batch[-1]}: {e}")
+                    continue
+                if status != "OK":
+                    continue
+
+                for uid, raw_email, truncated in _parse_fetch_response(msg_data):
+                    try:
                         msg = email.message_from_bytes(raw_email)
 
                         subject = _decode_header_value(msg.get("Subject"))
                         from_addr = _decode_header_value(msg.get("From"))
                         to_addr = _decode_header_value(msg.get("To"))
                         date_str = _decode_header_value(msg.get("Date"))
-                        body = _extract_body(msg)
+                        body = _extract_body(msg, truncated)
 
                         # Build .txt content
                         content_lines = [
@@ -210,54 +416,32 @@ class GmailConnector(BaseConnector):
                         # Save as .txt file
                         safe_subj = _safe_filename(subject)
                         filename = f"{uid}_{safe_subj}.txt"
-                        filepath = os.path.join(items_folder, filename)
-                        with open(filepath, "w", encoding="utf-8") as f:
-                            f.write(content)
+                        _write_item(items_folder, filename, content, dirfd)
 
                         new_items += 1
                         if uid > max_uid_this_folder:
                             max_uid_this_folder = uid
 
-                        if progress_callback and (i + 1) % 10 == 0:
-                            progress_callback(f"{folder}: fetched {i + 1}/{len(uids)} emails")
-
                     except Exception as e:
                         errors.append(f"UID {uid}: {e}")
 
-                uid_watermarks[folder] = max_uid_this_folder
+                if progress_callback:
+                    progress_callback(f"{folder}: fetched {start + len(batch)}/{len(uids)} emails")
 
-            imap.logout()
+            return folder, new_items, max_uid_this_folder, errors
 
-        except Exception as e:
-            errors.append(str(e))
-            self.status = ConnectorStatus.ERROR
-            self.last_error = str(e)
+        finally:
+            if dirfd is not None:
+                os.close(dirfd)
             try:
                 imap.logout()
             except Exception:
                 pass
-            return {"new_items": new_items, "total_items": self._count_items(), "errors": errors}
-
-        # Save updated state
-        self.last_sync = datetime.now().isoformat()
-        self.items_synced = self._count_items()
-        self.status = ConnectorStatus.IDLE
-        self.last_error = None
-        self.save_state({
-            "uid_watermarks": uid_watermarks,
-            "last_sync": self.last_sync,
-            "items_synced": self.items_synced,
-        })
-
-        return {
-            "new_items": new_items,
-            "total_items": self.items_synced,
-            "errors": errors,
-        }
 
     def _count_items(self) -> int:
         """Count .txt files in the items folder."""
         folder = self.get_items_folder()
         if not os.path.exists(folder):
             return 0
-        return len([f for f in os.listdir(folder) if f.endswith(".txt")])
+        with os.scandir(folder) as it:
+            return sum(1 for e in it if e.name.endswith(".txt") and e.is_file())
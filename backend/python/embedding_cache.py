@@ -0,0 +1,111 @@
+"""
+Persistent embedding cache — skips re-encoding chunk text seen before.
+
+Vectors are stored in SQLite (WAL mode) keyed by a namespace (model, backend
+and storage dtype, so a config change never returns a mismatched vector) and
+a BLAKE2b digest of the exact chunk text. Re-indexing an edited file then
+only encodes the chunks that actually changed.
+
+Each row records when it was last read or written; inserts evict the least
+recently used rows beyond a size cap, so vectors for deleted files and
+superseded namespaces age out instead of accumulating forever.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "..", "storage", "embedding_cache.db")
+
+# Keys per query; stays under SQLite's bound-parameter limit
+_QUERY_BATCH = 500
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _get_conn():
+    """Open the cache database once per process."""
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " namespace TEXT NOT NULL,"
+            " key BLOB NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " accessed_at INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (namespace, key)"
+            ") WITHOUT ROWID"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}
+        if "accessed_at" not in columns:
+            # Caches written before eviction existed; their rows are evicted first
+            conn.execute("ALTER TABLE embeddings ADD COLUMN accessed_at INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at)")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def text_key(text):
+    """Return the 16-byte cache key for a chunk of text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def get_many(namespace, keys, dtype):
+    """Return {key: vector} for the keys present in the cache, marking them as recently used."""
+    found = {}
+    unique = list(dict.fromkeys(keys))
+    now = int(time.time())
+    with _lock:
+        conn = _get_conn()
+        for start in range(0, len(unique), _QUERY_BATCH):
+            batch = unique[start:start + _QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE namespace = ? AND key IN ({placeholders})",
+                [namespace, *batch],
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=dtype)
+        hits = list(found)
+        for start in range(0, len(hits), _QUERY_BATCH):
+            batch = hits[start:start + _QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            conn.execute(
+                f"UPDATE embeddings SET accessed_at = ? WHERE namespace = ? AND key IN ({placeholders})",
+                [now, namespace, *batch],
+            )
+        if hits:
+            conn.commit()
+    return found
+
+
+def put_many(namespace, keys, vectors, max_entries=None):
+    """Store vectors (one row of a 2-D array per key), then evict the least recently
+    used rows beyond max_entries (no limit when None)."""
+    now = int(time.time())
+    with _lock:
+        conn = _get_conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (namespace, key, vector, accessed_at) VALUES (?, ?, ?, ?)",
+            [(namespace, key, vector.tobytes(), now) for key, vector in zip(keys, vectors)],
+        )
+        if max_entries is not None:
+            (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > max_entries:
+                conn.execute(
+                    "DELETE FROM embeddings WHERE (namespace, key) IN ("
+                    " SELECT namespace, key FROM embeddings ORDER BY accessed_at LIMIT ?"
+                    ")",
+                    (count - max_entries,),
+                )
+        conn.commit()
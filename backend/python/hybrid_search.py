@@ -3,12 +3,11 @@ Hybrid search combining vector results with BM25 keyword results
 using Reciprocal Rank Fusion (RRF).
 """
 
-import lancedb
-import os
+import heapq
+import threading
+from operator import itemgetter
 from bm25_search import bm25_search
-from config import get_table_name
-
-DB_PATH = os.path.join(os.path.dirname(__file__), "..", "storage", "vector_db")
+from vector_store import TABLE_NAME, get_table
 
 
 def hybrid_merge(query, vector_results, top_n=20, k=60):
@@ -28,58 +27,51 @@ def hybrid_merge(query, vector_results, top_n=20, k=60):
         return []
 
     # Load all chunks from LanceDB for BM25 search
-    all_chunks = _load_all_chunks()
+    all_chunks, corpus_key = _load_all_chunks()
     if not all_chunks:
         # No chunks available for BM25, return vector results as-is
         for r in vector_results:
             r["rrf_score"] = 0.0
         return vector_results[:top_n]
 
-    # Run BM25 over all chunks
-    bm25_results = bm25_search(query, all_chunks, top_n=50)
+    # Run BM25 over all chunks (inverted index is reused while the table version is unchanged)
+    bm25_results = bm25_search(query, all_chunks, top_n=50, corpus_key=corpus_key)
 
-    # Build RRF scores
-    # Key: file_path + chunk_index -> score
-    rrf_scores = {}
+    # Fuse both rankings into one dict keyed by file_path::chunk_index.
+    # Vector results are annotated in place (they are fresh per query);
+    # RRF contributions from either ranking accumulate as they arrive.
+    fused = {}
+    # RRF contribution per rank, shared by both rankings
+    inv_rank = [1.0 / (k + rank + 1) for rank in range(max(len(vector_results), len(bm25_results)))]
 
     # Score vector results by their rank
     for rank, result in enumerate(vector_results):
         key = _result_key(result)
-        rrf_scores[key] = rrf_scores.get(key, 0) + 1.0 / (k + rank + 1)
-
-    # Score BM25 results by their rank
-    bm25_lookup = {}
+        contribution = inv_rank[rank]
+        existing = fused.get(key)
+        if existing is None:
+            result["rrf_score"] = contribution
+            fused[key] = result
+        else:
+            existing["rrf_score"] += contribution
+
+    # Score BM25 results by their rank; BM25-only chunks are copied so the
+    # shared corpus list is never modified
     for rank, (idx, bm25_score) in enumerate(bm25_results):
         chunk = all_chunks[idx]
         key = _result_key(chunk)
-        rrf_scores[key] = rrf_scores.get(key, 0) + 1.0 / (k + rank + 1)
-        bm25_lookup[key] = chunk
-
-    # Build combined result list
-    # Start with vector results (they have full data)
-    seen_keys = set()
-    combined = []
-
-    for result in vector_results:
-        key = _result_key(result)
-        r = dict(result)
-        r["rrf_score"] = rrf_scores.get(key, 0)
-        combined.append(r)
-        seen_keys.add(key)
-
-    # Add BM25-only results (not in vector results)
-    for key, chunk in bm25_lookup.items():
-        if key not in seen_keys:
+        contribution = inv_rank[rank]
+        existing = fused.get(key)
+        if existing is None:
             r = dict(chunk)
-            r["rrf_score"] = rrf_scores.get(key, 0)
+            r["rrf_score"] = contribution
             r["_distance"] = 2.0  # max distance for BM25-only results
-            combined.append(r)
-            seen_keys.add(key)
-
-    # Sort by RRF score descending
-    combined.sort(key=lambda x: x.get("rrf_score", 0), reverse=True)
+            fused[key] = r
+        else:
+            existing["rrf_score"] += contribution
 
-    return combined[:top_n]
+    # Top results by RRF score descending (nlargest keeps ties in insertion order, like a stable sort)
+    return heapq.nlargest(top_n, fused.values(), key=itemgetter("rrf_score"))
 
 
 def _result_key(result):
@@ -89,24 +81,51 @@ def _result_key(result):
     return f"{fp}::{ci}"
 
 
+# Columns needed to build BM25 chunk dicts
+CHUNK_COLUMNS = ["text", "file_path", "chunk_index", "total_chunks", "file_hash"]
+
+# Last loaded chunk list, reused until the table version changes
+_chunks_cache = {"key": None, "chunks": []}
+_chunks_lock = threading.Lock()
+
+
 def _load_all_chunks():
-    """Load all chunks from LanceDB for BM25 search."""
+    """
+    Load all chunks from LanceDB for BM25 search.
+
+    Returns (chunks, key) where key is (table_name, table_version); it changes
+    on every write, so it doubles as the BM25 index cache key.
+    """
     try:
-        db = lancedb.connect(DB_PATH)
-        table_name = get_table_name()
-        table = db.open_table(table_name)
-        df = table.to_pandas()
-
-        chunks = []
-        for _, row in df.iterrows():
-            chunks.append({
-                "text": row.get("text", ""),
-                "file_path": row.get("file_path", ""),
-                "chunk_index": int(row.get("chunk_index", 0)),
-                "total_chunks": int(row.get("total_chunks", 1)),
-                "file_hash": row.get("file_hash", ""),
-            })
-        return chunks
+        # Shared connection and handle; strong consistency keeps version current
+        table = get_table()
+        key = (TABLE_NAME, table.version)
+
+        with _chunks_lock:
+            if _chunks_cache["key"] == key:
+                return _chunks_cache["chunks"], key
+
+        # Projected scan: only the text/metadata columns are read, never the vectors
+        try:
+            tbl = table.search().select(CHUNK_COLUMNS).limit(None).to_arrow()
+        except Exception:
+            tbl = table.to_arrow().select(CHUNK_COLUMNS)
+        cols = [tbl.column(name).to_pylist() for name in CHUNK_COLUMNS]
+        chunks = [
+            {
+                "text": text or "",
+                "file_path": file_path or "",
+                "chunk_index": chunk_index or 0,
+                "total_chunks": total_chunks or 1,
+                "file_hash": file_hash or "",
+            }
+            for text, file_path, chunk_index, total_chunks, file_hash in zip(*cols)
+        ]
+
+        with _chunks_lock:
+            _chunks_cache["key"] = key
+            _chunks_cache["chunks"] = chunks
+        return chunks, key
 
     except Exception:
-        return []
+        return [], None
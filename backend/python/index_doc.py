@@ -1,8 +1,56 @@
 import sys
+import json
 from vector_store import store_document
-from index_metadata import get_file_hash
+from index_metadata import get_file_hash, get_file_stamp
+
+
+def run_worker():
+    """
+    Persistent mode: index many files with one model load.
+
+    Each job on stdin is a JSON header line {"path": ..., "len": N} followed by
+    exactly N bytes of UTF-8 content. One JSON result line is written per job.
+    A malformed header or truncated content leaves no way to find where the
+    next job starts, so the worker reports it and exits with status 1.
+    """
+    stdin = sys.stdin.buffer
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+            file_path = job["path"]
+            length = job["len"]
+            if not isinstance(file_path, str) or not isinstance(length, int) or length < 0:
+                raise ValueError("header needs a string 'path' and a non-negative integer 'len'")
+        except Exception as e:
+            _write_result({"path": None, "error": f"Bad job header, stopping worker: {e}"})
+            return 1
+
+        data = stdin.read(length)
+        if len(data) != length:
+            _write_result({"path": file_path, "error": "Content ended early, stopping worker"})
+            return 1
+
+        try:
+            chunk_count = store_document(file_path, data.decode("utf-8"))
+            result = {"path": file_path, **(get_file_stamp(file_path) or {"hash": None}), "chunks": chunk_count}
+        except Exception as e:
+            result = {"path": file_path, "error": str(e)}
+        _write_result(result)
+    return 0
+
+
+def _write_result(result):
+    """Write one JSON result line and flush it to the parent."""
+    sys.stdout.write(json.dumps(result) + "\n")
+    sys.stdout.flush()
+
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        sys.exit(run_worker())
+
     file_path = sys.argv[1]
 
     # Read content from stdin instead of argv (handles newlines properly)
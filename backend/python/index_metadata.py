@@ -1,33 +1,93 @@
 import json
 import os
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import xxhash
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
+
 METADATA_FILE = os.path.join(os.path.dirname(__file__), "..", "storage", "index_metadata.json")
 
+# Hash lists at least this long with a thread pool (stat/read calls are latency-bound)
+PARALLEL_HASH_MIN_FILES = 64
+HASH_WORKERS = 8
+
+# Content hashing: xxh3 when available, blake2b otherwise. The algorithm is
+# part of the stored hash so switching between them re-indexes once, cleanly.
+HASH_BLOCK_SIZE = 1 << 20
+HASH_CACHE_SIZE = 65536
+HASH_PREFIX = "xxh3:" if HAS_XXHASH else "b2:"
+
 def load_metadata():
     """Load index metadata from disk"""
     if os.path.exists(METADATA_FILE):
-        with open(METADATA_FILE, 'r') as f:
-            return json.load(f)
+        with open(METADATA_FILE, 'rb') as f:
+            data = f.read()
+        return orjson.loads(data) if HAS_ORJSON else json.loads(data)
     return {"indexes": []}
 
 def save_metadata(metadata):
     """Save index metadata to disk"""
     os.makedirs(os.path.dirname(METADATA_FILE), exist_ok=True)
-    with open(METADATA_FILE, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    if HAS_ORJSON:
+        data = orjson.dumps(metadata, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(metadata, indent=2).encode()
+    with open(METADATA_FILE, 'wb') as f:
+        f.write(data)
 
-def get_file_hash(filepath):
-    """Get file hash for change detection"""
+@lru_cache(maxsize=HASH_CACHE_SIZE)
+def _content_hash(filepath, size, mtime_ns):
+    """Hash file contents; memoized on (path, size, mtime_ns) so unchanged files aren't re-read"""
+    h = xxhash.xxh3_64() if HAS_XXHASH else hashlib.blake2b(digest_size=8)
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            h.update(block)
+    return f"{HASH_PREFIX}{h.hexdigest()}"
+
+def get_file_hash(filepath, entry=None):
+    """Get content hash for change detection; pass the os.scandir DirEntry when walking a folder"""
+    stamp = get_file_stamp(filepath, entry)
+    return stamp["hash"] if stamp else None
+
+def get_file_stamp(filepath, entry=None):
+    """Content hash plus the size/mtime_ns it was taken at, for the per-file metadata entry"""
     try:
-        stat = os.stat(filepath)
-        # Use size + mtime as a simple hash
-        return f"{stat.st_size}_{int(stat.st_mtime)}"
+        stat = entry.stat() if entry is not None else os.stat(filepath)
+        return {
+            "hash": _content_hash(filepath, stat.st_size, stat.st_mtime_ns),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
     except:
         return None
 
+def _file_changed(filepath, previous):
+    """Compare a file with its stored entry; matching size and mtime_ns skip hashing entirely"""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return True
+    # mtime_ns is stored as a string when the entry came through the Node server
+    if str(previous.get("mtime_ns")) == str(stat.st_mtime_ns) and previous.get("size") == stat.st_size:
+        return False
+    try:
+        return _content_hash(filepath, stat.st_size, stat.st_mtime_ns) != previous.get("hash")
+    except OSError:
+        return True
+
 def find_or_create_index(folder_path):
     """Find existing index or create new one"""
     metadata = load_metadata()
@@ -96,14 +156,25 @@ def get_files_needing_index(folder_path, all_files):
     modified_files = []
     unchanged_files = []
     
+    known_files = []
     for file_info in all_files:
-        filepath = file_info["path"]
-        current_hash = get_file_hash(filepath)
-        
-        if filepath not in existing_files:
+        if file_info["path"] in existing_files:
+            known_files.append(file_info)
+        else:
             # New file
             new_files.append(file_info)
-        elif existing_files[filepath].get("hash") != current_hash:
+    
+    # Only files whose size/mtime_ns moved since the last index are re-hashed
+    known_paths = [f["path"] for f in known_files]
+    previous = [existing_files[fp] for fp in known_paths]
+    if len(known_paths) < PARALLEL_HASH_MIN_FILES:
+        changed = list(map(_file_changed, known_paths, previous))
+    else:
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+            changed = list(pool.map(_file_changed, known_paths, previous))
+    
+    for file_info, is_changed in zip(known_files, changed):
+        if is_changed:
             # Modified file
             modified_files.append(file_info)
         else:
@@ -5,26 +5,18 @@ from lxml import etree
 def extract_text_from_html(file_path):
     """Extract text from HTML or XML file by stripping tags."""
     try:
-        with open(file_path, "rb") as f:
-            raw = f.read()
-
+        # libxml2 reads the file itself, so the raw bytes are never copied into Python.
         # Try HTML first, fall back to XML
         try:
-            tree = etree.HTML(raw)
+            tree = etree.parse(file_path, etree.HTMLParser()).getroot()
         except Exception:
-            tree = etree.fromstring(raw)
+            tree = etree.parse(file_path).getroot()
 
         if tree is None:
             return "Error reading HTML/XML: could not parse file"
 
-        # Walk the tree and collect text with spacing between elements
-        parts = []
-        for element in tree.iter():
-            if element.text and element.text.strip():
-                parts.append(element.text.strip())
-            if element.tail and element.tail.strip():
-                parts.append(element.tail.strip())
-        return "\n".join(parts)
+        # Collect text nodes (lxml walks the tree in C), one per line
+        return "\n".join(s for s in (t.strip() for t in tree.itertext()) if s)
     except Exception as e:
         return f"Error reading HTML/XML: {str(e)}"
 
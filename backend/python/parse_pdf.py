@@ -4,13 +4,10 @@ import pymupdf  # PyMuPDF
 def extract_text_from_pdf(pdf_path):
     """Extract text from PDF file"""
     try:
-        doc = pymupdf.open(pdf_path)
-        text = ""
+        # One page's text at a time, joined once (no quadratic string growth)
+        with pymupdf.open(pdf_path) as doc:
+            text = "".join(page.get_text() for page in doc)
         
-        for page in doc:
-            text += page.get_text()
-        
-        doc.close()
         return text.strip()
     except Exception as e:
         return f"Error reading PDF: {str(e)}"
@@ -2,22 +2,23 @@ import sys
 from pptx import Presentation
 
 
+def iter_pptx_lines(pptx_path):
+    """Yield the text of a PowerPoint file line by line, slide by slide."""
+    prs = Presentation(pptx_path)
+    for i, slide in enumerate(prs.slides, 1):
+        yield f"Slide {i}:"
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                for paragraph in shape.text_frame.paragraphs:
+                    text = paragraph.text.strip()
+                    if text:
+                        yield text
+
+
 def extract_text_from_pptx(pptx_path):
     """Extract text from PowerPoint file by reading all slides."""
     try:
-        prs = Presentation(pptx_path)
-        lines = []
-
-        for i, slide in enumerate(prs.slides, 1):
-            lines.append(f"Slide {i}:")
-            for shape in slide.shapes:
-                if shape.has_text_frame:
-                    for paragraph in shape.text_frame.paragraphs:
-                        text = paragraph.text.strip()
-                        if text:
-                            lines.append(text)
-
-        return "\n".join(lines).strip()
+        return "\n".join(iter_pptx_lines(pptx_path)).strip()
     except Exception as e:
         return f"Error reading PPTX: {str(e)}"
 
@@ -27,5 +28,10 @@ if __name__ == "__main__":
         print("Usage: python parse_pptx.py <path_to_pptx>")
         sys.exit(1)
 
-    text = extract_text_from_pptx(sys.argv[1])
-    print(text)
+    # Stream lines as slides are read instead of building the whole text first
+    try:
+        for line in iter_pptx_lines(sys.argv[1]):
+            sys.stdout.write(line)
+            sys.stdout.write("\n")
+    except Exception as e:
+        print(f"Error reading PPTX: {str(e)}")
@@ -2,22 +2,26 @@ import sys
 from openpyxl import load_workbook
 
 
-def extract_text_from_xlsx(xlsx_path):
-    """Extract text from Excel file by reading all sheets and rows."""
+def iter_xlsx_lines(xlsx_path):
+    """Yield the text of an Excel file line by line, sheet by sheet."""
+    wb = load_workbook(xlsx_path, read_only=True, data_only=True)
     try:
-        wb = load_workbook(xlsx_path, read_only=True, data_only=True)
-        lines = []
-
         for sheet_name in wb.sheetnames:
             ws = wb[sheet_name]
-            lines.append(f"Sheet: {sheet_name}")
+            yield f"Sheet: {sheet_name}"
             for row in ws.iter_rows(values_only=True):
-                cells = [str(cell) if cell is not None else "" for cell in row]
-                if any(cells):
-                    lines.append(" | ".join(cells))
-
+                # Skip empty rows before stringifying any cells
+                if not any(cell is not None and cell != "" for cell in row):
+                    continue
+                yield " | ".join(str(cell) if cell is not None else "" for cell in row)
+    finally:
         wb.close()
-        return "\n".join(lines).strip()
+
+
+def extract_text_from_xlsx(xlsx_path):
+    """Extract text from Excel file by reading all sheets and rows."""
+    try:
+        return "\n".join(iter_xlsx_lines(xlsx_path)).strip()
     except Exception as e:
         return f"Error reading XLSX: {str(e)}"
 
@@ -27,5 +31,10 @@ if __name__ == "__main__":
         print("Usage: python parse_xlsx.py <path_to_xlsx>")
         sys.exit(1)
 
-    text = extract_text_from_xlsx(sys.argv[1])
-    print(text)
+    # Stream rows as they are read instead of building the whole text first
+    try:
+        for line in iter_xlsx_lines(sys.argv[1]):
+            sys.stdout.write(line)
+            sys.stdout.write("\n")
+    except Exception as e:
+        print(f"Error reading XLSX: {str(e)}")
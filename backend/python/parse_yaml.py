@@ -2,27 +2,44 @@ import sys
 import yaml
 
 
+# libyaml's C loader when PyYAML was built with it
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Stack marker for an already formatted line; YAML keys can be None, so a
+# private object is the only value no real prefix can equal
+_LINE = object()
+
+
+def flatten(data):
+    """Flatten parsed YAML to key-value lines, depth-first in document order."""
+    lines = []
+    # Entries are (node, prefix); a prefix of _LINE marks an already formatted line
+    stack = [(data, "")]
+    while stack:
+        obj, prefix = stack.pop()
+        if prefix is _LINE:
+            lines.append(obj)
+        elif isinstance(obj, dict):
+            children = []
+            for key, value in obj.items():
+                full_key = f"{prefix}.{key}" if prefix else key
+                if isinstance(value, (dict, list)):
+                    children.append((value, full_key))
+                else:
+                    children.append((f"{full_key}: {value}", _LINE))
+            stack.extend(reversed(children))
+        elif isinstance(obj, list):
+            stack.extend((obj[i], f"{prefix}[{i}]") for i in range(len(obj) - 1, -1, -1))
+        else:
+            lines.append(str(obj))
+    return lines
+
+
 def extract_text_from_yaml(yaml_path):
     """Extract text from YAML file by flattening to key-value pairs."""
     try:
         with open(yaml_path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
-
-        def flatten(obj, prefix=""):
-            lines = []
-            if isinstance(obj, dict):
-                for key, value in obj.items():
-                    full_key = f"{prefix}.{key}" if prefix else key
-                    if isinstance(value, (dict, list)):
-                        lines.extend(flatten(value, full_key))
-                    else:
-                        lines.append(f"{full_key}: {value}")
-            elif isinstance(obj, list):
-                for i, item in enumerate(obj):
-                    lines.extend(flatten(item, f"{prefix}[{i}]"))
-            else:
-                lines.append(str(obj))
-            return lines
+            data = yaml.load(f, Loader=_Loader)
 
         text_lines = flatten(data)
         return "\n".join(text_lines).strip()
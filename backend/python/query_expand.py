@@ -12,6 +12,8 @@ OLLAMA_URL = "http://localhost:11434/api/generate"
 OLLAMA_TIMEOUT = 15  # seconds
 DEFAULT_MODEL = "llama3.2:3b"
 
+_decoder = json.JSONDecoder()
+
 EXPANSION_PROMPT = """You are a search query expander. Given a user's search query, generate 3-5 specific search queries that would help find the document they're looking for. Also extract any hints about file types, people, projects, or topics.
 
 Respond ONLY with valid JSON in this exact format:
@@ -116,13 +118,14 @@ def _extract_json(text):
     except json.JSONDecodeError:
         pass
 
-    # Find JSON between braces
+    # Decode the first complete JSON object embedded in the text; anything
+    # after it (trailing prose, stray braces) is ignored
     start = text.find("{")
-    end = text.rfind("}") + 1
-    if start != -1 and end > start:
+    while start != -1:
         try:
-            return json.loads(text[start:end])
+            obj, _ = _decoder.raw_decode(text, start)
+            return obj
         except json.JSONDecodeError:
-            pass
+            start = text.find("{", start + 1)
 
     return None
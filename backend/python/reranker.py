@@ -3,26 +3,72 @@ Cross-encoder reranker using sentence-transformers CrossEncoder.
 Lazy-loads model on first use for fast startup.
 """
 
+import hashlib
+import threading
+from collections import OrderedDict
+from operator import itemgetter
+
+from config import get_reranker_backend, get_reranker_max_length
+from torch_runtime import configure_threads, inference_mode
+
 _model = None
 _MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 
+# "onnx" runs the int8-quantized export published with the model through
+# ONNX Runtime (needs optimum[onnxruntime]); "torch" is FP32 PyTorch
+_ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+# LRU of cross-encoder scores keyed by (query digest, passage digest)
+SCORE_CACHE_SIZE = 50_000
+_score_cache = OrderedDict()
+_score_lock = threading.Lock()
+
 
 def _get_model():
     """Lazy-load the cross-encoder model (once per process)."""
     global _model
     if _model is None:
         from sentence_transformers import CrossEncoder
-        _model = CrossEncoder(_MODEL_NAME)
+        configure_threads()
+        # Pairs are truncated to max_length tokens, which bounds the padded
+        # batch shape (attention cost grows with its square)
+        max_length = get_reranker_max_length()
+        if get_reranker_backend() == "onnx":
+            try:
+                _model = CrossEncoder(_MODEL_NAME, max_length=max_length, backend="onnx",
+                                      model_kwargs={"file_name": _ONNX_INT8_FILE})
+            except Exception as e:
+                import sys
+                print(f"ONNX reranker backend unavailable ({e}), using torch", file=sys.stderr)
+        if _model is None:
+            _model = CrossEncoder(_MODEL_NAME, max_length=max_length)
     return _model
 
 
+def warmup():
+    """Load the cross-encoder and score one pair ahead of the first search."""
+    try:
+        model = _get_model()
+        with inference_mode():
+            model.predict([["warmup", "warmup"]], show_progress_bar=False)
+    except Exception as e:
+        import sys
+        print(f"Reranker warmup failed: {e}", file=sys.stderr)
+
+
+def _digest(text):
+    """16-byte BLAKE2b digest used as a score cache key."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
 def rerank(query, results, top_n=10):
     """
     Rerank results using cross-encoder scoring.
 
     Args:
         query: The search query string
-        results: List of result dicts (must have 'text' field)
+        results: List of result dicts (must have 'text' field); the dicts are
+            annotated and the list reordered in place
         top_n: Number of top results to return
 
     Returns:
@@ -35,23 +81,42 @@ def rerank(query, results, top_n=10):
     try:
         model = _get_model()
 
-        # Build query-passage pairs for batch scoring
-        pairs = [[query, r.get("text", "")] for r in results]
+        texts = [r.get("text", "") for r in results]
+
+        # Reuse scores for (query, passage) pairs seen recently
+        query_key = _digest(query)
+        keys = [(query_key, _digest(t)) for t in texts]
+        scores = [None] * len(results)
+        with _score_lock:
+            for i, key in enumerate(keys):
+                score = _score_cache.get(key)
+                if score is not None:
+                    _score_cache.move_to_end(key)
+                    scores[i] = score
+        misses = [i for i, score in enumerate(scores) if score is None]
 
-        # Score all pairs in one batch
-        scores = model.predict(pairs)
+        if misses:
+            # Score the remaining pairs shortest passage first so each predict
+            # batch pads to a similar length, then scatter back to original order
+            order = sorted(misses, key=lambda i: len(texts[i]))
+            pairs = [[query, texts[i]] for i in order]
+            with inference_mode():
+                sorted_scores = model.predict(pairs, batch_size=32, show_progress_bar=False)
+            with _score_lock:
+                for rank, i in enumerate(order):
+                    scores[i] = float(sorted_scores[rank])
+                    _score_cache[keys[i]] = scores[i]
+                while len(_score_cache) > SCORE_CACHE_SIZE:
+                    _score_cache.popitem(last=False)
 
-        # Attach scores to results
-        scored = []
-        for i, result in enumerate(results):
-            r = dict(result)
-            r["rerank_score"] = float(scores[i])
-            scored.append(r)
+        # Attach scores in place: result dicts are built fresh for each query
+        for result, score in zip(results, scores):
+            result["rerank_score"] = score
 
         # Sort by rerank score descending
-        scored.sort(key=lambda x: x["rerank_score"], reverse=True)
+        results.sort(key=itemgetter("rerank_score"), reverse=True)
 
-        return scored[:top_n]
+        return results[:top_n]
 
     except Exception as e:
         import sys
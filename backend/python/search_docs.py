@@ -1,29 +1,63 @@
 import sys
 import json
-from vector_store import search_documents
-from config import is_feature_enabled
+import heapq
+from vector_store import search_documents_batch
+from config import is_feature_enabled, get_rerank_skip_thresholds
+
+INF = float('inf')
+
+def _distance_key(result):
+    """Sort key: vector distance, missing distances last."""
+    return result.get('_distance', INF)
 
 def deduplicate_results(results, limit):
     """Keep only the best match per file (best chunk)."""
-    seen = {}
+    best = {}
+    best_distance = {}
     for result in results:
-        file_path = result.get('file_path', '')
-        distance = result.get('_distance', float('inf'))
-        if file_path not in seen or distance < seen[file_path].get('_distance', float('inf')):
-            seen[file_path] = result
+        key = result.get('file_path', '')
+        distance = result.get('_distance', INF)
+        if key not in best or distance < best_distance[key]:
+            best[key] = result
+            best_distance[key] = distance
+    # Only the top `limit` are needed: O(N log limit) instead of a full sort
+    return heapq.nsmallest(limit, best.values(), key=_distance_key)
 
-    deduplicated = sorted(seen.values(), key=lambda x: x.get('_distance', float('inf')))
-    return deduplicated[:limit]
+def merge_vector_streams(result_lists, max_results=None):
+    """
+    Merge per-query result lists that are each already sorted by _distance.
 
-def merge_vector_results(all_results):
-    """Merge results from multiple vector searches, keeping best per file+chunk."""
-    best = {}
-    for result in all_results:
-        key = f"{result.get('file_path', '')}::{result.get('chunk_index', 0)}"
-        distance = result.get('_distance', float('inf'))
-        if key not in best or distance < best[key].get('_distance', float('inf')):
-            best[key] = result
-    return sorted(best.values(), key=lambda x: x.get('_distance', float('inf')))
+    A k-way heap merge walks the lists in global distance order, so the first
+    occurrence of a file+chunk is its best match and later ones are dropped
+    on the fly. Stops once max_results unique entries have been emitted.
+    """
+    merged = []
+    seen = set()
+    for result in heapq.merge(*result_lists, key=_distance_key):
+        key = (result.get('file_path', ''), result.get('chunk_index', 0))
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(result)
+        if max_results is not None and len(merged) >= max_results:
+            break
+    return merged
+
+def rerank_unnecessary(results):
+    """
+    True when the vector ranking is already decisive: the best match is very
+    close and clearly ahead of the runner-up, so the cross-encoder is unlikely
+    to reorder the top results. Logs the decision so thresholds can be tuned.
+    Always False unless the rerank_skip feature is enabled.
+    """
+    if not is_feature_enabled("rerank_skip"):
+        return False
+    max_distance, min_margin = get_rerank_skip_thresholds()
+    d = [r.get('_distance', INF) for r in results[:2]]
+    skip = len(d) >= 2 and d[0] < max_distance and (d[1] - d[0]) > min_margin
+    if len(d) >= 2:
+        print(f"Reranker {'skipped' if skip else 'run'}: top={d[0]:.4f} gap={d[1] - d[0]:.4f}", file=sys.stderr)
+    return skip
 
 if __name__ == "__main__":
     query = sys.argv[1]
@@ -34,6 +68,7 @@ if __name__ == "__main__":
     use_expansion = options.get("expansion", is_feature_enabled("query_expansion"))
     use_hybrid = options.get("hybrid", is_feature_enabled("hybrid_search"))
     use_reranker = options.get("reranker", is_feature_enabled("reranker"))
+    use_ann_cache = options.get("ann_cache", is_feature_enabled("ann_cache"))
 
     meta = {
         "used_llm": False,
@@ -54,15 +89,12 @@ if __name__ == "__main__":
         except Exception:
             pass
 
-    # --- Step 2: Vector Search per expanded query ---
-    all_vector_results = []
+    # --- Step 2: Vector Search per expanded query (one batched embed, concurrent lookups) ---
     candidates_per_query = max(50, limit * 5)
-    for q in expanded_queries:
-        results = search_documents(q, candidates_per_query)
-        all_vector_results.extend(results)
+    results_lists = search_documents_batch(expanded_queries, candidates_per_query, use_ann_cache)
 
-    # Merge best per file+chunk across all queries
-    merged = merge_vector_results(all_vector_results)
+    # Merge best per file+chunk across all queries (each list is distance-sorted)
+    merged = merge_vector_streams(results_lists, candidates_per_query)
 
     # --- Step 3: Hybrid BM25 + RRF (optional) ---
     if use_hybrid and merged:
@@ -76,7 +108,7 @@ if __name__ == "__main__":
     deduplicated = deduplicate_results(merged, limit * 2)
 
     # --- Step 5: Cross-Encoder Rerank (optional) ---
-    if use_reranker and deduplicated:
+    if use_reranker and deduplicated and not rerank_unnecessary(deduplicated):
         try:
             from reranker import rerank
             deduplicated = rerank(query, deduplicated, top_n=limit)
@@ -0,0 +1,85 @@
+"""
+Semantic query cache — reuses results for near-duplicate queries.
+
+Entries are keyed by an L2-normalized query embedding plus an exact-match key
+(e.g. limit + search options). A lookup returns the stored value when the
+cosine similarity to a cached embedding is at or above the threshold.
+Entries expire after a TTL and the cache evicts least-recently-used entries
+once full. Any write to the vector store bumps a global generation, which
+drops every cached entry on its next access.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL = 300  # seconds
+
+# Bumped whenever indexed content changes; caches clear themselves lazily
+_generation = 0
+
+
+def bump_generation():
+    """Invalidate all semantic caches (call after the index is modified)."""
+    global _generation
+    _generation += 1
+
+
+class SemanticCache:
+    """In-process LRU + TTL cache with cosine-similarity lookup."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # entry_id -> (vector, key, value, ts)
+        self._next_id = 0
+        self._generation = _generation
+        self._lock = threading.Lock()
+
+    def get(self, vector, key, threshold):
+        """Return the cached value for the most similar entry with this key, or None."""
+        with self._lock:
+            self._check_generation()
+            self._expire()
+
+            ids = [eid for eid, entry in self._entries.items() if entry[1] == key]
+            if not ids:
+                return None
+
+            matrix = np.stack([self._entries[eid][0] for eid in ids])
+            sims = matrix @ vector
+            best = int(np.argmax(sims))
+            if sims[best] < threshold:
+                return None
+
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            return self._entries[entry_id][2]
+
+    def put(self, vector, key, value):
+        """Store a value under a query embedding and exact-match key."""
+        with self._lock:
+            self._check_generation()
+            self._entries[self._next_id] = (np.asarray(vector, dtype=np.float32), key, value, time.monotonic())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def _check_generation(self):
+        if self._generation != _generation:
+            self._entries.clear()
+            self._generation = _generation
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        expired = [eid for eid, entry in self._entries.items() if entry[3] < cutoff]
+        for entry_id in expired:
+            del self._entries[entry_id]
@@ -3,7 +3,7 @@ Background sync engine — schedules connector syncs and indexes new content.
 
 Runs as asyncio tasks in FastAPI's event loop. Blocking IMAP I/O runs in a
 thread pool via run_in_executor. After sync, new .txt files are indexed
-through the existing pipeline (store_document + index_metadata).
+through the existing pipeline (store_documents_batch + index_metadata).
 """
 
 import asyncio
@@ -13,14 +13,25 @@ from concurrent.futures import ThreadPoolExecutor
 
 from connectors import connector_registry
 from connectors.base_connector import ConnectorStatus
-from vector_store import store_document, delete_document
+from vector_store import store_documents_batch, delete_document, ensure_vector_index
 from index_metadata import find_or_create_index, update_index_metadata, get_file_hash
 
-# Thread pool for blocking IMAP I/O
-_executor = ThreadPoolExecutor(max_workers=2)
+# Thread pool for blocking IMAP I/O, sized to the number of connectors so
+# concurrent syncs don't queue behind each other (see _ensure_executor)
+MAX_SYNC_WORKERS = 32
+_executor = None
+_executor_size = 0
 
-# Guard against concurrent syncs on the same connector
-_syncing_connectors = set()
+# Item files read and hashed concurrently when indexing a connector
+INDEX_CONCURRENCY = 4
+
+# Changed files stored per store_documents_batch call: one encode pass and one
+# table append per batch, bounded so a large first sync doesn't hold every
+# email's chunks and vectors in memory at once
+STORE_BATCH_SIZE = 256
+
+# One lock per connector; a sync that finds it held reports "already in progress"
+_sync_locks = {}
 
 # Active scheduled tasks
 _scheduled_tasks = {}
@@ -31,20 +42,20 @@ async def sync_connector(connector_id: str, progress_callback=None) -> dict:
     Run a sync for a single connector, then index any new/changed files.
     Returns the sync result dict.
     """
-    if connector_id in _syncing_connectors:
+    lock = _sync_locks.setdefault(connector_id, asyncio.Lock())
+    if lock.locked():
         return {"error": "Sync already in progress for this connector"}
 
-    connector = connector_registry.get_connector(connector_id)
-    if not connector:
-        return {"error": "Connector not found"}
-
-    _syncing_connectors.add(connector_id)
+    async with lock:
+        connector = connector_registry.get_connector(connector_id)
+        if not connector:
+            return {"error": "Connector not found"}
 
-    try:
         # Run blocking IMAP sync in thread pool
         loop = asyncio.get_event_loop()
+        executor = _executor or _ensure_executor(len(connector_registry.get_all_configs()))
         sync_result = await loop.run_in_executor(
-            _executor,
+            executor,
             lambda: connector.sync(progress_callback=progress_callback)
         )
 
@@ -56,9 +67,6 @@ async def sync_connector(connector_id: str, progress_callback=None) -> dict:
 
         return sync_result
 
-    finally:
-        _syncing_connectors.discard(connector_id)
-
 
 async def _index_connector_items(connector, progress_callback=None):
     """
@@ -75,41 +83,109 @@ async def _index_connector_items(connector, progress_callback=None):
     # Get existing indexed files to detect changes
     existing_files = index_entry.get("files", {})
 
-    txt_files = [f for f in os.listdir(items_folder) if f.endswith(".txt")]
-    files_metadata = {}
-    indexed_count = 0
+    txt_entries = await asyncio.to_thread(_list_txt_entries, items_folder)
 
-    for filename in txt_files:
-        filepath = os.path.join(items_folder, filename)
-        current_hash = get_file_hash(filepath)
+    # File reads and hashing run off the event loop, a few at a time
+    semaphore = asyncio.Semaphore(INDEX_CONCURRENCY)
 
-        # Skip if already indexed and unchanged
-        if filepath in existing_files and existing_files[filepath].get("hash") == current_hash:
-            files_metadata[filepath] = existing_files[filepath]
-            continue
+    async def check_one(entry):
+        async with semaphore:
+            return await asyncio.to_thread(_read_if_changed, entry, existing_files)
 
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                content = f.read()
-
-            if content.strip():
-                chunk_count = store_document(filepath, content)
-                files_metadata[filepath] = {
-                    "hash": current_hash,
-                    "chunks": chunk_count,
-                    "indexed_at": datetime.now().isoformat(),
-                }
-                indexed_count += 1
-        except Exception as e:
-            print(f"Failed to index {filepath}: {e}")
+    results = await asyncio.gather(*(check_one(entry) for entry in txt_entries))
+
+    files_metadata = {}
+    pending = []
+    for filepath, file_meta, content in results:
+        if content is not None:
+            pending.append((filepath, content, file_meta))
+        elif file_meta is not None:
+            files_metadata[filepath] = file_meta
+
+    # Changed files are embedded and appended in batches
+    indexed_count = 0
+    for start in range(0, len(pending), STORE_BATCH_SIZE):
+        batch = pending[start:start + STORE_BATCH_SIZE]
+        stored = await asyncio.to_thread(_store_batch, batch)
+        indexed_at = datetime.now().isoformat()
+        for filepath, file_meta, chunk_count in stored:
+            files_metadata[filepath] = {**file_meta, "chunks": chunk_count, "indexed_at": indexed_at}
+            indexed_count += 1
 
     # Update index metadata
     update_index_metadata(items_folder, files_metadata)
 
+    # Build / refresh the ANN index off the event loop once enough rows exist
+    if indexed_count:
+        asyncio.get_event_loop().run_in_executor(None, ensure_vector_index)
+
     if progress_callback:
         progress_callback(f"Indexed {indexed_count} new emails")
 
 
+def _list_txt_entries(items_folder):
+    """Return DirEntry objects for the .txt files in a connector's items folder."""
+    with os.scandir(items_folder) as it:
+        return [e for e in it if e.name.endswith(".txt") and e.is_file()]
+
+
+def _read_if_changed(entry, existing_files):
+    """
+    Read one item file unless it's unchanged since the last run (blocking).
+    Returns (filepath, metadata entry or None, content to index or None).
+    """
+    filepath = entry.path
+    try:
+        st = entry.stat()
+    except OSError:
+        return filepath, None, None  # removed since the folder was listed
+    previous = existing_files.get(filepath)
+
+    # Unchanged mtime and size: trust the stored entry without reading the file
+    if previous and previous.get("mtime_ns") == st.st_mtime_ns and previous.get("size") == st.st_size:
+        return filepath, previous, None
+
+    current_hash = get_file_hash(filepath, entry)
+    stamp = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+    # Touched but identical content: keep the entry, record the new stamp
+    if previous and previous.get("hash") == current_hash:
+        return filepath, {**previous, **stamp}, None
+
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            content = f.read()
+    except Exception as e:
+        print(f"Failed to index {filepath}: {e}")
+        return filepath, None, None
+
+    if not content.strip():
+        return filepath, None, None
+    return filepath, {"hash": current_hash, **stamp}, content
+
+
+def _store_batch(batch):
+    """
+    Store a batch of (filepath, content, file_meta) in one call (blocking).
+    If the batch fails, files are retried one at a time so a single bad file
+    doesn't drop the rest. Returns (filepath, file_meta, chunk_count) per stored file.
+    """
+    try:
+        counts = store_documents_batch([(filepath, content) for filepath, content, _ in batch])
+        return [(filepath, file_meta, count) for (filepath, _, file_meta), count in zip(batch, counts)]
+    except Exception as e:
+        print(f"Batch indexing failed ({e}), retrying files individually")
+
+    stored = []
+    for filepath, content, file_meta in batch:
+        try:
+            count = store_documents_batch([(filepath, content)])[0]
+            stored.append((filepath, file_meta, count))
+        except Exception as e:
+            print(f"Failed to index {filepath}: {e}")
+    return stored
+
+
 async def _scheduled_sync(connector_id: str, interval_minutes: int):
     """Background loop: sync a connector on a schedule."""
     while True:
@@ -120,10 +196,28 @@ async def _scheduled_sync(connector_id: str, interval_minutes: int):
             print(f"Scheduled sync failed for {connector_id}: {e}")
 
 
+def _ensure_executor(connector_count):
+    """
+    Make sure the sync pool has two workers per connector (capped at
+    MAX_SYNC_WORKERS). Threads are only spawned as syncs need them; a pool
+    that has become too small is replaced, and syncs already running on the
+    old one finish there.
+    """
+    global _executor, _executor_size
+    size = min(MAX_SYNC_WORKERS, max(2, connector_count * 2))
+    if _executor is None or size > _executor_size:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ThreadPoolExecutor(max_workers=size)
+        _executor_size = size
+    return _executor
+
+
 def start_all_schedules():
     """Start background sync schedules for all configured connectors. Call at startup."""
     connector_registry.restore_all()
     configs = connector_registry.get_all_configs()
+    _ensure_executor(len(configs))
     for entry in configs:
         connector_id = entry["id"]
         interval = entry.get("config", {}).get("sync_interval", 30)
@@ -141,6 +235,7 @@ def stop_all_schedules():
 
 def add_schedule(connector_id: str, interval_minutes: int):
     """Add a sync schedule for a newly created connector."""
+    _ensure_executor(len(connector_registry.get_all_configs()))
     if connector_id in _scheduled_tasks:
         _scheduled_tasks[connector_id].cancel()
     task = asyncio.create_task(_scheduled_sync(connector_id, interval_minutes))
@@ -152,3 +247,4 @@ def remove_schedule(connector_id: str):
     task = _scheduled_tasks.pop(connector_id, None)
     if task:
         task.cancel()
+    _sync_locks.pop(connector_id, None)
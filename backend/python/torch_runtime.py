@@ -0,0 +1,37 @@
+"""
+Process-wide PyTorch settings shared by the embedding model and the reranker.
+torch is imported lazily so modules that never run a model don't load it.
+"""
+
+import threading
+
+from config import get_torch_threads
+
+_configured = False
+_lock = threading.Lock()
+
+
+def configure_threads():
+    """Pin torch's CPU thread pools (once per process, before the first model loads).
+
+    Intra-op threads run the GEMM kernels of a forward pass; one inter-op
+    thread is enough because a sentence-transformers forward pass is a chain
+    of ops with no independent branches to overlap.
+    """
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        _configured = True
+        import torch
+        torch.set_num_threads(get_torch_threads())
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # can only be set before torch starts its first parallel region
+
+
+def inference_mode():
+    """Context manager that disables autograd tracking for a forward pass."""
+    import torch
+    return torch.inference_mode()
@@ -1,103 +1,501 @@
+import json
 import lancedb
-from sentence_transformers import SentenceTransformer
+import math
+import numpy as np
+import pyarrow as pa
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from index_metadata import get_file_hash
-from chunker import chunk_text
-from config import get_embedding_model, get_table_name
+from chunker import split_text
+import config
+from config import get_embedding_model, get_table_name, get_dimensions, get_embedding_dtype, get_embedding_backend
+from config import get_ann_cache_threshold, get_embedding_cache_max_entries
+from semantic_cache import SemanticCache, bump_generation
+import embedding_cache
+from torch_runtime import configure_threads, inference_mode
 
 # Initialize
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "storage", "vector_db")
-model = SentenceTransformer(get_embedding_model())
+
+# Resolved once per process: the loaded model fixes the table and vector size,
+# so a config edit mid-run can't pair one model's vectors with another's table
+MODEL_NAME = get_embedding_model()
+TABLE_NAME = get_table_name()
+DIMENSIONS = get_dimensions()
+
+# Precision for vectors in newly created tables; existing tables keep their
+# schema and LanceDB casts appended rows to it
+VECTOR_DTYPE = get_embedding_dtype()
+
+# "onnx" runs the int8-quantized export that ships with the sentence-transformers
+# model repos through ONNX Runtime (needs optimum[onnxruntime]); "torch" is FP32
+EMBEDDING_BACKEND = get_embedding_backend()
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+# Cached chunk vectors are only valid for this exact model/backend/precision
+_CACHE_NAMESPACE = f"{MODEL_NAME}/{EMBEDDING_BACKEND}/{VECTOR_DTYPE}"
+
+_model = None
+_model_lock = threading.Lock()
+
+# Connection and open table handles, reused across calls (see _get_table)
+_db = None
+_tables = {}
+_db_lock = threading.Lock()
+
+# Vectors are L2-normalized at ingest and query time, so a plain dot product
+# ranks exactly like cosine. LanceDB reports _distance = 1 - cosine (0..2).
+DISTANCE_TYPE = "dot"
+
+# ANN index: built once the table reaches INDEX_MIN_ROWS (brute force is fine
+# below that) and rebuilt when it has grown by INDEX_REBUILD_GROWTH since.
+# Searches re-rank refine_factor x limit PQ candidates on exact vectors so
+# _distance stays exact; without an index the refine step is a no-op.
+INDEX_MIN_ROWS = 10_000
+INDEX_REBUILD_GROWTH = 0.2
+INDEX_SUB_VECTORS = 48  # divides both 384 and 768
+INDEX_REFINE_FACTOR = 5
+_index_lock = threading.Lock()
+
+# Row count each table's index was last fully built at. Kept in its own file,
+# written atomically, rather than in engine_config.json, which Node rewrites too.
+INDEX_STATE_PATH = os.path.join(os.path.dirname(__file__), "..", "storage", "vector_index_state.json")
+
+# Paths per delete filter in store_documents_batch, keeping the IN list bounded
+_DELETE_BATCH = 500
+
+# Fans out the per-query ANN lookups of search_documents_batch
+_search_pool = ThreadPoolExecutor(max_workers=4)
+
+# Recent ANN results by query embedding; near-verbatim repeats of a recent query
+# skip LanceDB. Keyed on limit and table version, so writes from any process
+# (not just this one, which also bumps the cache generation) invalidate entries.
+_query_cache = SemanticCache(max_entries=256)
+
+# Columns returned by searches; the vector itself is never needed downstream
+# and would dominate both cached results and response size
+RESULT_COLUMNS = ["text", "file_path", "file_hash", "chunk_index", "total_chunks", "metadata", "_distance"]
+
+def _get_model():
+    """Lazy-load the embedding model (once per process).
+
+    Keeping the import and load out of module scope means parse worker
+    processes, which re-import the server module, never pay for torch.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = _load_model()
+    return _model
+
+def _load_model():
+    """Load the embedding model on the configured backend, falling back to torch."""
+    from sentence_transformers import SentenceTransformer
+    configure_threads()
+    if EMBEDDING_BACKEND == "onnx":
+        try:
+            return SentenceTransformer(MODEL_NAME, backend="onnx", model_kwargs={"file_name": ONNX_INT8_FILE})
+        except Exception as e:
+            print(f"ONNX embedding backend unavailable ({e}), using torch", file=sys.stderr)
+    return SentenceTransformer(MODEL_NAME)
+
+def _encode(inputs, **kwargs):
+    """Run model.encode without autograd bookkeeping."""
+    model = _get_model()
+    with inference_mode():
+        return model.encode(inputs, **kwargs)
+
+def warmup():
+    """Load the embedding model and run one forward pass now, so the first
+    request doesn't pay for lazy initialisation of the kernels."""
+    _encode(["warmup"])
 
 def init_db():
-    """Initialize LanceDB"""
-    os.makedirs(DB_PATH, exist_ok=True)
-    db = lancedb.connect(DB_PATH)
-    return db
+    """Initialize LanceDB and return the shared connection (created once per process)."""
+    return _get_db()
+
+def _get_db():
+    """Return the process-wide LanceDB connection, connecting on first use.
+
+    Strong read consistency (interval 0) makes cached table handles pick up
+    writes made by other connections or processes on their next read.
+    """
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                os.makedirs(DB_PATH, exist_ok=True)
+                _db = lancedb.connect(DB_PATH, read_consistency_interval=timedelta(0))
+    return _db
+
+def _get_table(name=TABLE_NAME):
+    """Return a cached handle to an existing table (raises if it doesn't exist)."""
+    table = _tables.get(name)
+    if table is None:
+        db = _get_db()
+        with _db_lock:
+            table = _tables.get(name)
+            if table is None:
+                table = db.open_table(name)
+                _tables[name] = table
+    return table
+
+def get_table():
+    """Return the shared handle to the documents table (raises if it doesn't exist yet)."""
+    return _get_table()
+
+def _forget_table(name=TABLE_NAME):
+    """Drop a cached table handle so the next _get_table reopens it."""
+    with _db_lock:
+        _tables.pop(name, None)
+
+def _table_schema():
+    """Schema for a newly created table."""
+    value_type = pa.float16() if VECTOR_DTYPE == "float16" else pa.float32()
+    return pa.schema([
+        pa.field("vector", pa.list_(value_type, DIMENSIONS)),
+        pa.field("text", pa.string()),
+        pa.field("file_path", pa.string()),
+        pa.field("file_hash", pa.string()),
+        pa.field("chunk_index", pa.int64()),
+        pa.field("total_chunks", pa.int64()),
+        pa.field("metadata", pa.string()),
+    ])
+
+def _chunk_rows(file_path, file_hash, texts, embeddings, metadata):
+    """Build the rows for one file's chunks as a columnar Arrow table.
+
+    The (N, DIMENSIONS) embedding matrix becomes the fixed-size-list vector
+    column without a per-row copy; per-file values are repeated columns.
+    """
+    n = len(texts)
+    vectors = pa.FixedSizeListArray.from_arrays(pa.array(embeddings.reshape(-1)), DIMENSIONS)
+    return pa.Table.from_arrays(
+        [
+            vectors,
+            pa.array(texts, pa.string()),
+            pa.array([file_path] * n, pa.string()),
+            pa.array([file_hash] * n, pa.string()),
+            pa.array(np.arange(n, dtype=np.int64)),
+            pa.array(np.full(n, n, dtype=np.int64)),
+            pa.array([metadata] * n, pa.string()),
+        ],
+        schema=_table_schema(),
+    )
+
+def _embed_chunks(texts):
+    """Embed chunk texts in VECTOR_DTYPE, encoding only those missing from the embedding cache."""
+    dtype = np.dtype(VECTOR_DTYPE)
+    keys = [embedding_cache.text_key(t) for t in texts]
+    try:
+        cached = embedding_cache.get_many(_CACHE_NAMESPACE, keys, dtype)
+    except Exception as e:
+        print(f"Embedding cache unavailable: {e}", file=sys.stderr)
+        cached = {}
+
+    embeddings = np.empty((len(texts), DIMENSIONS), dtype=dtype)
+    misses = []
+    for i, key in enumerate(keys):
+        vector = cached.get(key)
+        if vector is None or vector.shape[0] != DIMENSIONS:
+            misses.append(i)
+        else:
+            embeddings[i] = vector
+
+    if misses:
+        encoded = _encode(
+            [texts[i] for i in misses], batch_size=64, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(dtype)
+        embeddings[misses] = encoded
+        try:
+            embedding_cache.put_many(
+                _CACHE_NAMESPACE, [keys[i] for i in misses], encoded,
+                max_entries=get_embedding_cache_max_entries(),
+            )
+        except Exception as e:
+            print(f"Embedding cache write failed: {e}", file=sys.stderr)
+
+    return embeddings
 
 def store_document(file_path, text, metadata=None):
     """Store a document's chunks as separate embeddings with full text."""
-    db = init_db()
-    table_name = get_table_name()
+    return store_documents_batch([(file_path, text)], metadata)[0]
 
-    # Delete existing rows for this file (clean re-index)
+def store_documents_batch(items, metadata=None):
+    """
+    Store several documents at once: one delete, one encode pass over every
+    new chunk and one append. items is a list of (file_path, text); returns
+    the chunk count stored for each item, in order.
+    """
+    if not items:
+        return []
+
+    # Delete existing rows for these files (clean re-index)
     try:
-        table = db.open_table(table_name)
-        escaped = file_path.replace("'", "''")
-        table.delete(f"file_path = '{escaped}'")
+        table = _get_table()
+        paths = [file_path for file_path, _ in items]
+        for start in range(0, len(paths), _DELETE_BATCH):
+            quoted = ",".join(_sql_quote(p) for p in paths[start:start + _DELETE_BATCH])
+            table.delete(f"file_path IN ({quoted})")
     except:
         pass
 
     # Chunk the text
-    chunks = chunk_text(text)
-    if not chunks:
-        return 0
+    per_file = [split_text(text) for _, text in items]
+    counts = [len(chunks) for chunks in per_file]
+    all_texts = [t for chunks in per_file for t in chunks]
+    if not all_texts:
+        return counts
 
-    # Batch-embed all chunks at once
-    chunk_texts = [c["text"] for c in chunks]
-    embeddings = model.encode(chunk_texts)
-
-    # Get file hash for tracking
-    file_hash = get_file_hash(file_path)
-
-    # Prepare rows — one per chunk, full text stored
-    data = []
-    for i, chunk in enumerate(chunks):
-        data.append({
-            "vector": embeddings[i].tolist(),
-            "text": chunk["text"],
-            "file_path": file_path,
-            "file_hash": file_hash,
-            "chunk_index": chunk["chunk_index"],
-            "total_chunks": chunk["total_chunks"],
-            "metadata": str(metadata or {})
-        })
+    # Batch-embed every chunk at once (previously seen chunk texts come from the cache)
+    embeddings = _embed_chunks(all_texts)
+
+    meta = str(metadata or {})
+    tables = []
+    offset = 0
+    for (file_path, _), chunks in zip(items, per_file):
+        if not chunks:
+            continue
+        # Get file hash for tracking
+        file_hash = get_file_hash(file_path)
+        tables.append(_chunk_rows(file_path, file_hash, chunks, embeddings[offset:offset + len(chunks)], meta))
+        offset += len(chunks)
+    data = pa.concat_tables(tables)
 
     # Create or append to table
     try:
-        table = db.open_table(table_name)
+        table = _get_table()
         table.add(data)
     except:
-        table = db.create_table(table_name, data)
+        _forget_table()
+        table = _get_db().create_table(TABLE_NAME, data, schema=_table_schema())
+        with _db_lock:
+            _tables[TABLE_NAME] = table
+
+    bump_generation()
+    return counts
 
-    return len(chunks)
+def _sql_quote(value):
+    """Quote a string literal for a LanceDB filter expression."""
+    return "'" + value.replace("'", "''") + "'"
 
 def delete_document(file_path):
     """Delete a document from the index"""
-    db = init_db()
-    table_name = get_table_name()
-
     try:
-        table = db.open_table(table_name)
-        escaped = file_path.replace("'", "''")
-        table.delete(f"file_path = '{escaped}'")
+        table = _get_table()
+        table.delete(f"file_path = {_sql_quote(file_path)}")
+        bump_generation()
         return True
     except Exception as e:
         print(f"Error deleting document: {e}")
         return False
 
+def embed_query(query):
+    """Return the L2-normalized embedding for a query string."""
+    return _encode(query, normalize_embeddings=True)
+
 def search_documents(query, limit=10):
     """Search for similar documents"""
-    db = init_db()
-    table_name = get_table_name()
+    # Generate query embedding (normalized, so it can be matched against the query cache)
+    query_vector = embed_query(query)
+    return search_by_vector(query_vector, limit)
 
-    # Generate query embedding
-    query_vector = model.encode(query).tolist()
+def search_by_vector(query_vector, limit=10, use_cache=None):
+    """Search for documents similar to an already-computed (L2-normalized) query embedding.
+
+    use_cache overrides the ann_cache feature flag for the ANN result cache.
+    """
+    if use_cache is None:
+        use_cache = config.ANN_CACHE
 
     # Search
     try:
-        table = db.open_table(table_name)
-        results = table.search(query_vector).limit(limit).to_list()
-        return results
+        table = _get_table()
+        cache_key = (limit, table.version)
+        cached = _cached_results(query_vector, cache_key) if use_cache else None
+        if cached is not None:
+            return cached
+        results = _ann_search(table, query_vector, limit)
+        return _cache_results(query_vector, cache_key, results) if use_cache else results
     except:
+        _forget_table()
+        return []
+
+def _ann_search(table, query_vector, limit):
+    """Nearest chunks to query_vector, without their vectors."""
+    return (
+        table.search(query_vector.tolist())
+        .distance_type(DISTANCE_TYPE)
+        .select(RESULT_COLUMNS)
+        .limit(limit)
+        .refine_factor(INDEX_REFINE_FACTOR)
+        .to_list()
+    )
+
+def _cached_results(query_vector, cache_key):
+    """Return copies of the results of a near-identical recent query, or None."""
+    cached = _query_cache.get(query_vector, cache_key, get_ann_cache_threshold())
+    if cached is None:
+        return None
+    return [dict(r) for r in cached]
+
+def _cache_results(query_vector, cache_key, results):
+    """Remember results for query_vector; callers get copies they are free to mutate."""
+    _query_cache.put(query_vector, cache_key, results)
+    return [dict(r) for r in results]
+
+def embed_queries(queries):
+    """Embed several queries in one batched forward pass (L2-normalized)."""
+    return _encode(queries, batch_size=32, normalize_embeddings=True, convert_to_numpy=True)
+
+def search_documents_batch(queries, limit=10, use_cache=None):
+    """Search for several queries at once. Returns one result list per query, in order."""
+    if use_cache is None:
+        use_cache = config.ANN_CACHE
+    if not queries:
         return []
 
+    try:
+        table = _get_table()
+        cache_key = (limit, table.version)
+    except:
+        _forget_table()
+        return [[] for _ in queries]
+
+    # One embedding call for all queries, then concurrent ANN lookups
+    vectors = embed_queries(queries)
+
+    def _search(vector):
+        cached = _cached_results(vector, cache_key) if use_cache else None
+        if cached is not None:
+            return cached
+        try:
+            results = _ann_search(table, vector, limit)
+            return _cache_results(vector, cache_key, results) if use_cache else results
+        except:
+            return []
+
+    return list(_search_pool.map(_search, vectors))
+
+def ensure_vector_index():
+    """
+    Build the IVF_PQ index once the table is large enough, and rebuild it
+    after substantial growth; otherwise just fold new rows into it.
+    Slow on big tables — call from a background task. Returns True if (re)built.
+    """
+    try:
+        table = _get_table()
+        rows = table.count_rows()
+    except:
+        return False
+    if rows < INDEX_MIN_ROWS:
+        return False
+
+    with _index_lock:
+        try:
+            indexed_rows = _read_index_state().get(TABLE_NAME, 0)
+            if (indexed_rows and rows <= indexed_rows * (1 + INDEX_REBUILD_GROWTH)
+                    and _index_distance_type(table) == DISTANCE_TYPE):
+                # Compact and add new rows to the existing index incrementally
+                table.optimize()
+                return False
+
+            table.create_index(
+                metric=DISTANCE_TYPE,
+                num_partitions=int(math.sqrt(rows)),
+                num_sub_vectors=INDEX_SUB_VECTORS,
+                vector_column_name="vector",
+                replace=True,
+            )
+            _write_index_rows(rows)
+            return True
+        except Exception as e:
+            print(f"Error building vector index: {e}")
+            return False
+
+def _read_index_state():
+    """Return {table_name: rows at last index build} (empty if never built)."""
+    try:
+        with open(INDEX_STATE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_index_rows(rows):
+    """Record the row count TABLE_NAME's index was built at (call with _index_lock held).
+
+    Written to a temp file and renamed over the old one, so a reader never
+    sees a partial file.
+    """
+    state = _read_index_state()
+    state[TABLE_NAME] = rows
+    os.makedirs(os.path.dirname(INDEX_STATE_PATH), exist_ok=True)
+    tmp_path = f"{INDEX_STATE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, INDEX_STATE_PATH)
+
+def _index_distance_type(table):
+    """Return the metric the table's vector index was built with, or None.
+
+    Searches with a different metric fall back to brute force, so an index
+    left over from before the switch to dot product must be rebuilt.
+    """
+    try:
+        for index in table.list_indices():
+            if "vector" in index.columns:
+                return table.index_stats(index.name).distance_type
+    except Exception:
+        pass
+    return None
+
+def migrate_vector_dtype():
+    """
+    Rewrite the table so stored vectors use the configured embedding_dtype.
+
+    Existing tables keep the precision they were created with; this one-shot
+    migration casts the vector column in place of re-encoding every chunk.
+    Returns True if the table was rewritten.
+    """
+    try:
+        table = _get_table()
+    except:
+        return False
+
+    target = pa.list_(pa.float16() if VECTOR_DTYPE == "float16" else pa.float32(), DIMENSIONS)
+    if table.schema.field("vector").type == target:
+        return False
+
+    data = table.to_arrow()
+    index = data.schema.get_field_index("vector")
+    data = data.set_column(index, pa.field("vector", target), data.column("vector").cast(target))
+
+    table = _get_db().create_table(TABLE_NAME, data, mode="overwrite")
+    with _db_lock:
+        _tables[TABLE_NAME] = table
+    # Overwriting drops the ANN index; let ensure_vector_index build a fresh one
+    with _index_lock:
+        _write_index_rows(0)
+    bump_generation()
+    return True
+
 def get_indexed_count():
     """Get total number of indexed chunks"""
-    db = init_db()
-    table_name = get_table_name()
     try:
-        table = db.open_table(table_name)
-        return table.count_rows()
+        return _get_table().count_rows()
     except:
+        _forget_table()
         return 0
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate-dtype":
+        if migrate_vector_dtype():
+            print(f"Migrated {TABLE_NAME} vectors to {VECTOR_DTYPE}")
+        else:
+            print(f"{TABLE_NAME} already stores {VECTOR_DTYPE} vectors (or does not exist)")
+    else:
+        print("Usage: python vector_store.py migrate-dtype")
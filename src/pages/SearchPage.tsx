@@ -100,7 +100,8 @@ export function SearchPage() {
       const sigmoid = 1 / (1 + Math.exp(-result.rerank_score));
       return (sigmoid * 100).toFixed(0);
     }
-    return ((2 - result._distance) / 2 * 100).toFixed(0);
+    // _distance is 1 - cosine similarity
+    return (Math.max(0, 1 - result._distance) * 100).toFixed(0);
   };
 
   return (